@@ -0,0 +1,117 @@
+"""Parity check of the kernel backends and dtypes against the float64 numpy reference.
+
+Classifies generated signals (and a few edge-case signals) with every
+installed backend in float64 and float32 and compares features and labels
+with the float64 'numpy' backend. The documented tolerances are:
+
+    float64: features within a relative 1e-9, at most 0.01% of labels differ
+    float32: features within a relative 1e-5, at most 0.1% of labels differ
+
+Labels can only differ for frames whose autocorrelation peak or features lie
+within rounding error of a threshold. Every backend and dtype is also run in
+cascade mode, whose labels must equal its own full path exactly. Exits with
+code 1 on a mismatch, so it can gate CI:
+
+    python -m benchmarks.check_backends
+    python -m benchmarks.check_backends --backends numba --dtypes float32 --durations 1 60
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from src.voice_classifier import VoiceClassifier
+from src.kernel_backends import available_backends
+from benchmarks.run_benchmarks import generate_signal
+
+# Tolerances against the float64 numpy reference, per dtype
+FEATURE_RTOL = {'float64': 1e-9, 'float32': 1e-5}
+MAX_LABEL_MISMATCH = {'float64': 1e-4, 'float32': 1e-3}
+
+
+def edge_case_signals(sr=16000):
+    """Short signals that exercise the frame and pitch edge cases."""
+    rng = np.random.default_rng(1)
+    t = np.arange(sr) / sr
+    return {
+        "silence": np.zeros(sr, dtype=np.float32),
+        "shorter_than_frame": (0.1 * rng.standard_normal(300)).astype(np.float32),
+        "dc_offset": np.full(sr // 4, 0.2, dtype=np.float32),
+        "pure_tone": (0.5 * np.sin(2 * np.pi * 200 * t)).astype(np.float32),
+        "impulses": np.where(np.arange(sr) % 160 == 0, 1.0, 0.0).astype(np.float32)
+    }
+
+
+def compare(name, reference, candidate, feature_rtol, max_label_mismatch):
+    """Compare candidate (features, labels) with reference and return a list of problems."""
+    ref_features, ref_labels = reference
+    features, labels = candidate
+    problems = []
+    if features.shape != ref_features.shape:
+        return [f"{name}: feature shape {features.shape} != {ref_features.shape}"]
+    
+    scale = np.maximum(np.abs(ref_features), np.finfo(np.float64).tiny)
+    mismatch = labels != ref_labels
+    # Pitch is only comparable where both backends found the frame voiced
+    both_voiced = (ref_features[:, 2] > 0) & (features[:, 2] > 0)
+    for column, feature_name in enumerate(VoiceClassifier.FEATURE_NAMES):
+        rows = both_voiced if feature_name == 'pitch' else np.ones(len(labels), dtype=bool)
+        error = np.max(np.abs(features[rows, column] - ref_features[rows, column]) / scale[rows, column], initial=0.0)
+        if error > feature_rtol:
+            problems.append(f"{name}: {feature_name} relative error {error:.3g} > {feature_rtol:g}")
+    
+    mismatch_fraction = mismatch.mean() if len(labels) else 0.0
+    if mismatch_fraction > max_label_mismatch:
+        problems.append(f"{name}: {mismatch.sum()} of {len(labels)} labels differ")
+    return problems
+
+
+def main():
+    """Run the parity check and exit with code 1 on a mismatch."""
+    parser = argparse.ArgumentParser(description="Check kernel backends against the numpy reference")
+    parser.add_argument("--backends", nargs='+', help="Backends to check (default: every installed backend)")
+    parser.add_argument("--durations", nargs='+', type=float, default=[1, 10, 60], help="Generated signal lengths in seconds")
+    parser.add_argument("--dtypes", nargs='+', default=list(FEATURE_RTOL), choices=list(FEATURE_RTOL), help="Precisions to check")
+    args = parser.parse_args()
+    
+    # Every backend/dtype pair, including the reference itself for its cascade mode
+    candidates = [(backend, dtype) for backend in (args.backends or available_backends()) for dtype in args.dtypes]
+    cascade_classifiers = {(backend, dtype): VoiceClassifier(progress=False, backend=backend, dtype=dtype, cascade=True)
+                           for backend, dtype in candidates}
+    
+    signals = edge_case_signals()
+    signals.update({f"generated_{duration:g}s": generate_signal(duration) for duration in args.durations})
+    
+    reference = VoiceClassifier(progress=False)
+    problems = []
+    for backend, dtype in candidates:
+        classifier = VoiceClassifier(progress=False, backend=backend, dtype=dtype)
+        for name, signal in signals.items():
+            expected = reference.extract_features(reference.extract_frames(signal, 16000, lazy=True), 16000)
+            frames = classifier.extract_frames(signal, 16000, lazy=True)
+            
+            # The first call for an array layout includes the JIT compilation
+            classifier.extract_features(frames, 16000)
+            start = time.perf_counter()
+            result = classifier.extract_features(frames, 16000)
+            seconds = time.perf_counter() - start
+            
+            found = compare(f"{backend}/{dtype}/{name}", expected, result, FEATURE_RTOL[dtype], MAX_LABEL_MISMATCH[dtype])
+            problems += found
+            print(f"{backend:>8} {dtype:>8} {name:>20} {len(frames):8d} frames {seconds:8.4f}s  {'FAIL' if found else 'ok'}")
+            
+            # Cascade mode skips pitch on frames ZCR and energy rule out; labels must not change
+            _, cascade_labels = cascade_classifiers[backend, dtype].extract_features(frames, 16000)
+            if not np.array_equal(cascade_labels, result[1]):
+                problems.append(f"{backend}/{dtype}/{name}: {np.sum(cascade_labels != result[1])} cascade labels differ")
+    
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+    print("All backends and dtypes are within tolerance of the float64 numpy reference")
+
+
+if __name__ == "__main__":
+    main()
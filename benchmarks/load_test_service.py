@@ -0,0 +1,130 @@
+"""Load test for the local classification service.
+
+Sends generated clips from many concurrent clients to POST /classify and
+reports throughput, latency percentiles and how many requests were merged
+into each shared batch. Starts a service in this process unless --port
+points at one that is already running:
+
+    python -m benchmarks.load_test_service --clients 32 --requests 500 --clip-duration 2
+    python main.py --serve --port 8000 &
+    python -m benchmarks.load_test_service --port 8000
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+
+import numpy as np
+import soundfile as sf
+
+from src.classification_service import ClassificationService
+from benchmarks.run_benchmarks import generate_signal
+
+
+async def post(host, port, path, body, content_type='audio/wav'):
+    """Send one request on a new connection and return (status, JSON payload)."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: {content_type}\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(payload)
+
+
+async def get(host, port, path):
+    """Send one GET request and return the JSON payload."""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.partition(b'\r\n\r\n')[2])
+
+
+async def run_load_test(host, port, body, clients, requests):
+    """Send requests from concurrent clients and return per-request latencies."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+    
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            status, payload = await post(host, port, '/classify?labels=0', body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+    
+    await asyncio.gather(*[client() for _ in range(clients)])
+    return np.array(latencies), errors
+
+
+async def main(args):
+    """Run the load test described by the command line arguments."""
+    signal = generate_signal(args.clip_duration)
+    buffer = io.BytesIO()
+    sf.write(buffer, signal, 16000, format='WAV', subtype='PCM_16')
+    body = buffer.getvalue()
+    
+    service = None
+    port = args.port
+    if port is None:
+        service = ClassificationService(port=0, workers=args.workers, max_wait_ms=args.max_wait_ms, verbose=False)
+        await service.start()
+        port = service.port
+    
+    try:
+        before = await get(args.host, port, '/health')
+        start = time.perf_counter()
+        latencies, errors = await run_load_test(args.host, port, body, args.clients, args.requests)
+        wall_time = time.perf_counter() - start
+        after = await get(args.host, port, '/health')
+    finally:
+        if service is not None:
+            await service.stop()
+            service.executor.shutdown()
+    
+    batches = after['batches'] - before['batches']
+    batched_requests = after['batched_requests'] - before['batched_requests']
+    result = {
+        "clients": args.clients,
+        "requests": args.requests,
+        "clip_duration": args.clip_duration,
+        "errors": errors,
+        "wall_time": wall_time,
+        "requests_per_second": args.requests / wall_time,
+        "audio_seconds_per_second": args.requests * args.clip_duration / wall_time,
+        "latency_p50": float(np.percentile(latencies, 50)),
+        "latency_p95": float(np.percentile(latencies, 95)),
+        "latency_p99": float(np.percentile(latencies, 99)),
+        "batches": batches,
+        "requests_per_batch": batched_requests / batches if batches else 0.0
+    }
+    
+    print(f"{args.requests} requests from {args.clients} clients in {wall_time:.2f}s "
+          f"({result['requests_per_second']:.1f} req/s, {errors} errors)")
+    print(f"Latency p50 {result['latency_p50']*1000:.1f} ms, p95 {result['latency_p95']*1000:.1f} ms, "
+          f"p99 {result['latency_p99']*1000:.1f} ms")
+    print(f"{batches} batches, {result['requests_per_batch']:.1f} requests per batch")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Results saved to '{args.output}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the local classification service")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Service address")
+    parser.add_argument("--port", type=int, help="Port of a running service (one is started in-process if not set)")
+    parser.add_argument("--clients", type=int, default=16, help="Number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="Total number of requests")
+    parser.add_argument("--clip-duration", type=float, default=2.0, help="Length of each uploaded clip in seconds")
+    parser.add_argument("--workers", type=int, help="Threads of the in-process service")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Batching window of the in-process service")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file")
+    asyncio.run(main(parser.parse_args()))
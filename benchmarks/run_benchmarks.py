@@ -0,0 +1,276 @@
+"""Benchmark suite for every stage of the classification pipeline.
+
+Runs offline on generated signals (voiced-like harmonic tones, noise and
+silence) and reports wall time, frames per second and peak memory for
+each stage and input length. Results are written as JSON and can be
+compared against a stored baseline:
+
+    python -m benchmarks.run_benchmarks --durations 1 10 60 --output benchmarks/results/latest.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+from src.voice_classifier import VoiceClassifier
+from src.audio_file_handler import AudioFileHandler
+from src.frame_spec import FrameSpec
+
+STAGES = ('startup', 'extract_frames', 'extract_features', 'process_many', 'save_classified_segments', 'visualizer', 'end_to_end')
+# Stages that run in a subprocess and report peak RSS instead of tracemalloc peaks
+SUBPROCESS_STAGES = ('startup', 'end_to_end')
+DEFAULT_DURATIONS = (1, 10, 60, 600, 3600)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generate_signal(duration, sr=16000, seed=0):
+    """Generate a test signal cycling through voiced, unvoiced and silent seconds.
+    
+    Voiced seconds are harmonic tones with a slowly varying pitch, unvoiced
+    seconds are white noise and silent seconds are very low level noise.
+    """
+    rng = np.random.default_rng(seed)
+    n_samples = int(duration * sr)
+    t = np.arange(n_samples) / sr
+    kind = (t.astype(np.int64) % 3)
+    
+    pitch = 120 + 40 * np.sin(2 * np.pi * 0.2 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sr
+    voiced = sum(0.3 / k * np.sin(k * phase) for k in range(1, 6))
+    
+    signal = np.where(kind == 0, voiced, 0.0)
+    signal = np.where(kind == 1, 0.1 * rng.standard_normal(n_samples), signal)
+    signal = np.where(kind == 2, 1e-4 * rng.standard_normal(n_samples), signal)
+    return signal.astype(np.float32)
+
+
+class StageRunner:
+    """Runs the pipeline stages on one generated signal."""
+    
+    def __init__(self, duration, sr, work_dir, backend='numpy', dtype='float64', cascade=False, jobs=1, pool='thread'):
+        self.sr = sr
+        self.work_dir = work_dir
+        self.signal = generate_signal(duration, sr)
+        self.classifier = VoiceClassifier(backend=backend, dtype=dtype, cascade=cascade, frame_spec=FrameSpec(sr),
+                                          jobs=jobs, pool=pool)
+        self.file_handler = AudioFileHandler(output_dir=work_dir, file_format='wav', frame_spec=FrameSpec(sr))
+        self.frames = self.classifier.extract_frames(self.signal, sr, lazy=True)
+        self._features = None
+    
+    @property
+    def n_frames(self):
+        return len(self.frames)
+    
+    def features(self):
+        if self._features is None:
+            self._features = self.classifier.extract_features(self.frames, self.sr, progress=False)
+        return self._features
+    
+    def extract_frames(self):
+        self.classifier.extract_frames(self.signal, self.sr, lazy=True)
+    
+    def extract_features(self):
+        self.classifier.extract_features(self.frames, self.sr, progress=False)
+    
+    def process_many(self):
+        clip_length = 2 * self.sr
+        clips = [self.signal[start:start + clip_length] for start in range(0, len(self.signal), clip_length)]
+        self.classifier.process_many(clips, self.sr)
+    
+    def save_classified_segments(self):
+        _, labels = self.features()
+        self.file_handler.save_classified_segments(self.signal, self.frames, labels, self.sr)
+    
+    def visualizer(self):
+        import matplotlib
+        matplotlib.use('Agg')
+        from src.audio_visualizer import AudioVisualizer
+        
+        features, labels = self.features()
+        visualizer = AudioVisualizer(output_dir=self.work_dir)
+        visualizer.plot_features(self.signal, self.sr, self.frames, labels, self.classifier, features=features)
+        visualizer.plot_zcr_classification_comparison(self.frames, labels, self.classifier, features=features, sr=self.sr)
+    
+    def startup(self):
+        """Run main.py --help in a subprocess: interpreter start plus module imports.
+        
+        Returns:
+            Peak resident memory of the subprocess in MB
+        """
+        return self._run_main(['--help'])
+    
+    def end_to_end(self):
+        """Run main.py on a WAV file in a subprocess.
+        
+        Returns:
+            Peak resident memory of the subprocess in MB
+        """
+        wav_path = os.path.join(self.work_dir, 'input.wav')
+        if not os.path.exists(wav_path):
+            sf.write(wav_path, self.signal, self.sr)
+        
+        mode = ['--analysis-mode', 'telephony'] if self.sr == 8000 else []
+        return self._run_main(['--file', wav_path, '--output', self.work_dir] + mode)
+    
+    def _run_main(self, arguments):
+        """Run main.py with arguments in a subprocess and return its peak RSS in MB."""
+        env = dict(os.environ, MPLBACKEND='Agg')
+        command = [sys.executable, '-c',
+                   'import os, runpy, sys; sys.argv = sys.argv[1:]; '
+                   'sys.path.insert(0, os.path.dirname(sys.argv[0])); '
+                   'exec("try: runpy.run_path(sys.argv[0], run_name=\'__main__\')\\nexcept SystemExit: pass"); '
+                   # resource is POSIX only; without it the peak RSS is reported as None
+                   'exec("try:\\n import resource\\nexcept ImportError: pass\\n'
+                   'else: print(\'PEAK_RSS_KB\', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)")',
+                   os.path.join(REPO_ROOT, 'main.py')] + arguments
+        result = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+        peak_kb = [line.split()[1] for line in result.stdout.splitlines() if line.startswith('PEAK_RSS_KB')]
+        return int(peak_kb[-1]) / 1024 if peak_kb else None
+
+
+def measure(runner, stage, repeat):
+    """Measure the best wall time of a stage and its peak memory.
+    
+    Peak memory is taken from a separate run under tracemalloc so that
+    tracing does not slow down the timed runs.
+    """
+    stage_fn = getattr(runner, stage)
+    
+    best = float('inf')
+    peak_mb = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = stage_fn()
+        best = min(best, time.perf_counter() - start)
+        if stage in SUBPROCESS_STAGES:
+            peak_mb = result
+    
+    if stage not in SUBPROCESS_STAGES:
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage_fn()
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    
+    return {
+        "seconds": best,
+        "frames_per_second": runner.n_frames / best if best > 0 and stage != 'startup' else None,
+        "peak_memory_mb": peak_mb
+    }
+
+
+def run_benchmarks(durations, stages, sr=16000, repeat=3, backend='numpy', dtype='float64', cascade=False, jobs=1,
+                   pool='thread'):
+    """Run every stage for every duration and return the results document."""
+    results = []
+    for duration in durations:
+        with tempfile.TemporaryDirectory() as work_dir:
+            runner = StageRunner(duration, sr, work_dir, backend, dtype, cascade, jobs, pool)
+            for stage in stages:
+                # Startup does not depend on the input length
+                if stage == 'startup' and duration != durations[0]:
+                    continue
+                entry = {"stage": stage, "duration": duration, "n_frames": runner.n_frames}
+                entry.update(measure(runner, stage, repeat if stage != 'end_to_end' else 1))
+                results.append(entry)
+                print(f"{stage:>26} {duration:>6g}s  {entry['seconds']:9.4f}s  "
+                      f"{entry['frames_per_second'] or 0:12.0f} frames/s  "
+                      f"{entry['peak_memory_mb'] or 0:9.1f} MB")
+            runner.classifier.close()
+    
+    return {
+        "metadata": {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "sample_rate": sr,
+            "repeat": repeat,
+            "backend": backend,
+            "dtype": dtype,
+            "cascade": cascade,
+            "jobs": jobs,
+            "pool": pool
+        },
+        "results": results
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the time ratio of each result against the baseline.
+    
+    Returns:
+        regressions: List of (stage, duration, ratio) slower than tolerance
+    """
+    baseline_times = {(r["stage"], r["duration"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    print(f"\nComparison against baseline ({baseline['metadata'].get('timestamp')}):")
+    for r in results["results"]:
+        key = (r["stage"], r["duration"])
+        if key not in baseline_times:
+            continue
+        ratio = r["seconds"] / baseline_times[key]
+        flag = ''
+        if ratio > tolerance:
+            flag = '  REGRESSION'
+            regressions.append((r["stage"], r["duration"], ratio))
+        print(f"{r['stage']:>26} {r['duration']:>6g}s  {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the classification pipeline")
+    parser.add_argument("--durations", type=float, nargs='+', default=DEFAULT_DURATIONS, help="Signal lengths in seconds")
+    parser.add_argument("--stages", nargs='+', default=STAGES, choices=STAGES, help="Stages to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (best is reported)")
+    parser.add_argument("--output", type=str, default="benchmarks/results/latest.json", help="Path of the JSON results")
+    parser.add_argument("--baseline", type=str, help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.2, help="Slowdown ratio reported as a regression")
+    parser.add_argument("--startup-budget", type=float, help="Fail if main.py startup takes longer than this many seconds")
+    parser.add_argument("--backend", type=str, default="numpy", help="Kernel backend of the classifier (numpy, numba)")
+    parser.add_argument("--dtype", type=str, default="float64", choices=["float64", "float32"], help="Precision of frames and features")
+    parser.add_argument("--sample-rate", type=int, default=16000, help="Analysis sample rate (8000 for the telephony mode)")
+    parser.add_argument("--jobs", type=int, default=1, help="Shard workers of the classifier (1 runs serially)")
+    parser.add_argument("--shard-pool", type=str, default="thread", choices=["thread", "process"], help="Pool the shards run on")
+    parser.add_argument("--cascade", action="store_true", help="Skip the pitch stage on frames that ZCR and energy already classify")
+    args = parser.parse_args()
+    
+    results = run_benchmarks(args.durations, args.stages, sr=args.sample_rate, repeat=args.repeat, backend=args.backend,
+                             dtype=args.dtype, cascade=args.cascade, jobs=args.jobs, pool=args.shard_pool)
+    
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to '{args.output}'")
+    
+    failed = False
+    if args.startup_budget is not None:
+        for r in results["results"]:
+            if r["stage"] == 'startup' and r["seconds"] > args.startup_budget:
+                print(f"Startup took {r['seconds']:.3f}s, over the budget of {args.startup_budget:.3f}s")
+                failed = True
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            failed = True
+    
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
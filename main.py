@@ -1,41 +1,284 @@
+import time
+_START_TIME = time.perf_counter()
+
 import argparse
+import json
 import os
+import numpy as np
 from src.voice_classifier import VoiceClassifier
-from src.audio_visualizer import AudioVisualizer
+from src.kernel_backends import KERNEL_BACKENDS
+from src.frame_spec import FrameSpec, ANALYSIS_MODES
 from src.audio_file_handler import AudioFileHandler
-from src.voice_downloader import VoiceDownloader
+from src.feature_cache import FeatureCache
+from src.metrics import Metrics, PrometheusExporter
+from src.debug_renderer import DebugFrameRenderer
+
+# matplotlib (AudioVisualizer), gTTS (VoiceDownloader) and the batch process
+# pool are imported only by the code paths that need them
+
+def stream_audio_file(file_path, classifier, file_handler, block_duration, verbose=True, store_path=None):
+    """Classify a file in streaming mode, optionally appending to a feature store, and print the label counts."""
+    counts = [0, 0, 0]
+    blocks = file_handler.process_audio_file_stream(file_path, classifier, block_duration=block_duration,
+                                                    store_path=store_path)
+    for features, labels in blocks:
+        for label in (0, 1, 2):
+            counts[label] += int(np.sum(labels == label))
+    
+    if not verbose:
+        return
+    
+    total_frames = max(sum(counts), 1)
+    print(f"Classification results:")
+    print(f"  Voiced frames: {counts[2]} ({counts[2]/total_frames*100:.1f}%)")
+    print(f"  Unvoiced frames: {counts[1]} ({counts[1]/total_frames*100:.1f}%)")
+    print(f"  Silent frames: {counts[0]} ({counts[0]/total_frames*100:.1f}%)")
+
+
+def frame_spec(args):
+    """Build the FrameSpec of --analysis-mode, --frame-length and --frame-stride."""
+    return FrameSpec.from_mode(args.analysis_mode, args.frame_length, args.frame_stride)
+
+
+def run_batch(args):
+    """Classify every file matched by --batch and write the JSON summary."""
+    from src.batch_processor import BatchProcessor
+    
+    batch_processor = BatchProcessor(jobs=args.jobs, output_dir=args.output,
+                                     classifier_kwargs={"backend": args.backend, "dtype": args.dtype,
+                                                        "cascade": args.cascade, "frame_spec": frame_spec(args)},
+                                     audio_backend=args.audio_backend, res_type=args.resampler)
+    files = batch_processor.collect_files(args.batch)
+    if not files:
+        print(f"Error: No audio files found for {args.batch}")
+        return
+    
+    if not args.quiet:
+        print(f"Classifying {len(files)} files with {batch_processor.jobs} workers")
+    summary = batch_processor.run(files)
+    summary_path = batch_processor.write_summary(summary, args.summary or os.path.join(args.output, 'batch_summary.json'))
+    
+    if args.quiet:
+        return
+    print(f"Processed {summary['total_files']} files in {summary['wall_time']:.2f} seconds ({summary['failed_files']} failed)")
+    print(f"Summary saved to '{summary_path}'")
+
+
+def run_service(args):
+    """Run the local classification service until interrupted."""
+    from src.classification_service import ClassificationService
+    
+    metrics = Metrics() if args.metrics_file else None
+    classifier = VoiceClassifier(metrics=metrics, progress=False, backend=args.backend, dtype=args.dtype,
+                                 cascade=args.cascade, frame_spec=frame_spec(args))
+    service = ClassificationService(classifier=classifier, host=args.host, port=args.port, workers=args.jobs,
+                                    max_wait_ms=args.max_wait_ms, metrics=metrics, verbose=not args.quiet)
+    service.run()
+    if metrics is not None:
+        PrometheusExporter(args.metrics_file).write(metrics)
+
+
+def run_tuning(args, classifier, file_handler):
+    """Sweep the threshold grid for --file against the --tune reference and save the scores."""
+    from src.threshold_tuner import ThresholdTuner
+    from src.segment_index import SegmentIndex
+    
+    # Reference: a segment index (.npz, e.g. a corrected segments.npz) or per-frame labels (.npy)
+    reference = SegmentIndex.load(args.tune) if args.tune.endswith('.npz') else np.load(args.tune)
+    
+    tuner = ThresholdTuner(classifier)
+    signal, sr = file_handler.load_audio(args.file)
+    tuner.add(signal, sr, reference)
+    
+    start = time.perf_counter()
+    result = tuner.sweep(**tuner.default_grid())
+    sweep_seconds = time.perf_counter() - start
+    
+    best = result.best()
+    tuning = {
+        "file": args.file,
+        "reference": args.tune,
+        "frames": len(tuner),
+        "combinations": int(np.prod(result.shape)),
+        "sweep_seconds": sweep_seconds,
+        "current": tuner.evaluate(),
+        "best": best,
+        "top": result.top(10)
+    }
+    os.makedirs(args.output, exist_ok=True)
+    tuning_path = os.path.join(args.output, 'tuning.json')
+    with open(tuning_path, 'w') as f:
+        json.dump(tuning, f, indent=2)
+    
+    if args.quiet:
+        return
+    print(f"Scored {tuning['combinations']} threshold combinations on {tuning['frames']} frames in {sweep_seconds:.2f} seconds")
+    print(f"  Current macro F1: {tuning['current']['macro_f1']:.3f}")
+    print(f"  Best macro F1: {best['macro_f1']:.3f} with {best['thresholds']}")
+    print(f"Tuning results saved to '{tuning_path}'")
+
+
+def report_cascade(metrics):
+    """Print how many frames skipped the pitch stage in cascade mode."""
+    evaluated = metrics.counters.get('pitch_evaluated', 0)
+    skipped = metrics.counters.get('pitch_skipped', 0)
+    total = max(evaluated + skipped, 1)
+    print(f"Cascade: pitch skipped on {skipped} of {evaluated + skipped} frames ({skipped/total*100:.1f}%)")
+
+
+def plot_store(args):
+    """Plot a time range of the feature store in <output>/features without reprocessing."""
+    from src.audio_visualizer import AudioVisualizer
+    from src.feature_store import FeatureStore
+    
+    store_path = os.path.join(args.output, 'features')
+    if not os.path.exists(store_path):
+        print(f"Error: No feature store in {store_path}")
+        return
+    start_time, end_time = args.plot_range
+    plot_path = AudioVisualizer(output_dir=args.output).plot_store_range(FeatureStore(store_path), start_time, end_time)
+    if not args.quiet:
+        print(f"Plot of {start_time:g}-{end_time:g} s saved to '{plot_path}'")
+
+
+def write_summary_json(path, file_path, labels, startup_seconds, run_seconds):
+    """Write a machine-readable summary of a single-file run."""
+    summary = {
+        "file": file_path,
+        "frames": len(labels),
+        "label_counts": {
+            "voiced": int(np.sum(labels == 2)),
+            "unvoiced": int(np.sum(labels == 1)),
+            "silent": int(np.sum(labels == 0))
+        },
+        "startup_seconds": startup_seconds,
+        "run_seconds": run_seconds
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    return path
+
 
 def main():
     """Main entry point for the application."""
     parser = argparse.ArgumentParser(description="Voice/Unvoiced Classification Tool")
     parser.add_argument("-f", "--file", type=str, help="Path to audio file (MP3, WAV) to analyze")
     parser.add_argument("-o", "--output", type=str, default="output", help="Directory to save output files")
+    parser.add_argument("--stream", action="store_true", help="Classify the file block by block with bounded memory (no plots or exports)")
+    parser.add_argument("--block-duration", type=float, default=30.0, help="Block length in seconds for --stream")
+    parser.add_argument("--batch", type=str, help="Directory, glob pattern or manifest file of audio files to classify")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of worker processes for --batch (threads for --serve)")
+    parser.add_argument("--shard-jobs", type=int, default=1, help="Shard workers that classify a long --file in parallel (1 runs serially)")
+    parser.add_argument("--shard-pool", type=str, default="thread", choices=["thread", "process"], help="Pool the shards of a --file are classified on with --shard-jobs")
+    parser.add_argument("--summary", type=str, help="Path of the JSON summary for --batch (default: <output>/batch_summary.json)")
+    parser.add_argument("--cache-dir", type=str, help="Directory of the feature cache (caching is off when not set)")
+    parser.add_argument("--cache-size-mb", type=float, default=1024, help="Maximum size of the feature cache in MB")
+    parser.add_argument("--format", type=str, default="mp3", help="Format of the saved segment files (mp3, wav, flac, ogg)")
+    parser.add_argument("--audio-backend", type=str, default="auto", choices=["auto", "soundfile", "librosa"], help="Audio decoding backend")
+    parser.add_argument("--analysis-mode", type=str, default="wideband", choices=list(ANALYSIS_MODES), help="Analysis sample rate: wideband (16 kHz) or telephony (8 kHz, half the samples per frame)")
+    parser.add_argument("--frame-length", type=float, help="Frame length in ms (default 25)")
+    parser.add_argument("--frame-stride", type=float, help="Frame stride in ms (default 10)")
+    parser.add_argument("--resampler", type=str, default="soxr_hq", help="Resampler used when the file rate differs from the analysis rate (e.g. soxr_hq, soxr_qq, polyphase)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not print progress messages or show the progress bar")
+    parser.add_argument("--metrics-file", type=str, help="Write per-stage timings and sizes to this file in Prometheus text format")
+    parser.add_argument("--debug-frames", type=str, choices=DebugFrameRenderer.POLICIES, help="Render per-frame debug plots for frames sampled with this policy")
+    parser.add_argument("--debug-every", type=int, default=100, help="Stride for --debug-frames every_nth")
+    parser.add_argument("--debug-per-class", type=int, default=20, help="Frames per class for --debug-frames stratified")
+    parser.add_argument("--no-plots", action="store_true", help="Headless mode: classify and export without importing matplotlib or drawing plots")
+    parser.add_argument("--summary-json", type=str, help="Write label counts, startup time and run time of a single-file run to this JSON file")
+    parser.add_argument("--serve", action="store_true", help="Run the local HTTP/WebSocket classification service")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address the service listens on")
+    parser.add_argument("--port", type=int, default=8000, help="Port the service listens on")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Longest time a service request waits for others to join its batch")
+    parser.add_argument("--backend", type=str, default="numpy", choices=list(KERNEL_BACKENDS), help="Kernel backend of the feature engine (numba must be installed for numba)")
+    parser.add_argument("--dtype", type=str, default="float64", choices=["float64", "float32"], help="Precision of frames and features (float32 halves memory traffic)")
+    parser.add_argument("--cascade", action="store_true", help="Skip the pitch stage on frames that ZCR and energy already classify (same labels)")
+    parser.add_argument("--plot-range", type=float, nargs=2, metavar=("START", "END"), help="Plot this time range (seconds) from the feature store of a previous run in --output")
+    parser.add_argument("--tune", type=str, help="Reference labels for --file (.npz segment index or .npy frame labels): sweep the thresholds and write <output>/tuning.json")
     args = parser.parse_args()
     
-    print("Voice/Unvoiced/Silent Classification Tool")
-    print("---------------------------------")
+    if not args.quiet:
+        print("Voice/Unvoiced/Silent Classification Tool")
+        print("---------------------------------")
+    
+    if args.serve:
+        run_service(args)
+        return
+    
+    if args.batch:
+        run_batch(args)
+        return
     
-    # Initialize the classes
-    classifier = VoiceClassifier()
-    visualizer = AudioVisualizer(output_dir=args.output)
-    file_handler = AudioFileHandler(output_dir=args.output)
+    if args.plot_range and not args.file:
+        plot_store(args)
+        return
+    
+    # Initialize the classes (--cascade collects metrics to report the skipped pitch frames)
+    metrics = Metrics() if args.metrics_file or args.cascade else None
+    debug_renderer = None
+    if args.debug_frames:
+        debug_renderer = DebugFrameRenderer(output_dir=args.output, policy=args.debug_frames,
+                                            every=args.debug_every, per_class=args.debug_per_class)
+    classifier = VoiceClassifier(metrics=metrics, progress=not args.quiet, debug=debug_renderer is not None,
+                                 debug_renderer=debug_renderer, backend=args.backend, dtype=args.dtype,
+                                 cascade=args.cascade, frame_spec=frame_spec(args), jobs=args.shard_jobs,
+                                 pool=args.shard_pool)
+    visualizer = None
+    if not args.no_plots and not args.tune:
+        from src.audio_visualizer import AudioVisualizer
+        visualizer = AudioVisualizer(output_dir=args.output, metrics=metrics)
+    cache = FeatureCache(args.cache_dir, max_size_mb=args.cache_size_mb) if args.cache_dir else None
+    file_handler = AudioFileHandler(output_dir=args.output, cache=cache, file_format=args.format,
+                                    audio_backend=args.audio_backend, res_type=args.resampler,
+                                    metrics=metrics, verbose=not args.quiet, frame_spec=classifier.frame_spec)
+    
+    # Time spent on imports and setup before any audio is touched
+    startup_seconds = time.perf_counter() - _START_TIME
     
     if args.file:
         if os.path.exists(args.file):
-            print(f"Processing audio file: {args.file}")
-            features, labels = file_handler.process_audio_file(args.file, classifier, visualizer)
-            print(f"Processing complete. Results saved to '{args.output}' directory")
+            if not args.quiet:
+                print(f"Processing audio file: {args.file}")
+                print(f"Startup time: {startup_seconds*1000:.0f} ms")
+            run_start = time.perf_counter()
+            if args.tune:
+                run_tuning(args, classifier, file_handler)
+            elif args.stream:
+                stream_audio_file(args.file, classifier, file_handler, args.block_duration, verbose=not args.quiet,
+                                  store_path=os.path.join(args.output, 'features'))
+            else:
+                features, labels = file_handler.process_audio_file(args.file, classifier, visualizer)
+                if not args.quiet:
+                    print(f"Processing complete. Results saved to '{args.output}' directory")
+                    if args.cascade:
+                        report_cascade(metrics)
+                if args.summary_json:
+                    write_summary_json(args.summary_json, args.file, labels, startup_seconds,
+                                       time.perf_counter() - run_start)
+            if args.plot_range and not args.tune:
+                plot_store(args)
+            classifier.close()
+            if args.metrics_file:
+                PrometheusExporter(args.metrics_file).write(metrics)
         else:
             print(f"Error: File {args.file} not found")
     else:
         # word = input("Enter a word to download and analyze: ") or "Hello Today is a good day take a deep breath"
         word = "Hello Today is a good day take a deep breath"
+        from src.voice_downloader import VoiceDownloader
         voice_downloader = VoiceDownloader()
         file_name = voice_downloader.download_voice(word)
         assert file_name is not None, f"Failed to download {word}"
         assert os.path.exists(file_name), f"File {file_name} not found"
         features, labels = file_handler.process_audio_file(file_name, classifier, visualizer)
-        print(f"Processing complete. Results saved to '{args.output}' directory")
+        if not args.quiet:
+            print(f"Processing complete. Results saved to '{args.output}' directory")
+        classifier.close()
+        if args.metrics_file:
+            PrometheusExporter(args.metrics_file).write(metrics)
 
 
 if __name__ == "__main__":
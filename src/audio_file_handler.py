@@ -1,102 +1,380 @@
 import os
 import numpy as np
-import librosa
 import soundfile as sf
+from src.segment_index import SegmentIndex
+from src.metrics import NullMetrics, timed
+from src.frame_spec import FrameSpec
 
 class AudioFileHandler:
     """Class for handling audio file operations"""
     
-    def __init__(self, output_dir='output'):
-        """Initialize with output directory."""
+    def __init__(self, output_dir='output', cache=None, file_format='mp3', audio_backend='auto', res_type='soxr_hq',
+                 metrics=None, verbose=True, frame_spec=None):
+        """Initialize with output directory, an optional FeatureCache, the segment
+        file format, the default audio backend and resampler for load_audio,
+        an optional Metrics collector, whether to print progress messages and
+        the FrameSpec whose sample rate and stride are used when no classifier
+        gives them (16 kHz, 10 ms by default)."""
         self.output_dir = output_dir
+        self.frame_spec = frame_spec if frame_spec is not None else FrameSpec()
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        self.verbose = verbose
+        self.cache = cache
+        self.file_format = file_format
+        self.audio_backend = audio_backend
+        self.res_type = res_type
         os.makedirs(self.output_dir, exist_ok=True)
     
-    def load_audio(self, file_path, sr=16000):
+    def _log(self, message):
+        """Print a message unless the handler is quiet."""
+        if self.verbose:
+            print(message)
+    
+    @timed('load')
+    def load_audio(self, file_path, sr='analysis', offset=0.0, duration=None, backend=None, res_type=None):
         """Load audio file and normalize.
         
-        Supports various audio formats including MP3, WAV, etc. via librosa.
+        Supports various audio formats including MP3, WAV, etc. WAV, FLAC and
+        other formats readable by soundfile are decoded directly (PCM WAV
+        through a memory map), and only the requested time range is read.
+        Resampling is skipped when the file already has the target rate.
+        librosa is used for formats soundfile cannot read.
+        
+        Args:
+            file_path: Path to audio file
+            sr: Target sample rate; 'analysis' is the rate of the handler's
+                frame spec and None keeps the native rate
+            offset: Start of the range to load in seconds
+            duration: Length of the range to load in seconds (None reads to the end)
+            backend: 'auto', 'soundfile' or 'librosa' (defaults to the handler's audio_backend)
+            res_type: Resampler passed to librosa.resample, e.g. 'soxr_hq',
+                'soxr_qq' (fastest) or 'polyphase' (defaults to the handler's res_type)
         """
-        y, sr = librosa.load(file_path, sr=sr)
+        backend = backend or self.audio_backend
+        res_type = res_type or self.res_type
+        if sr == 'analysis':
+            sr = self.frame_spec.sr
+        
+        if backend == 'auto':
+            try:
+                sf.info(file_path)
+                backend = 'soundfile'
+            except RuntimeError:
+                backend = 'librosa'
+        
+        # librosa is slow to import, so it is only loaded for decoding fallbacks and resampling
+        if backend == 'librosa':
+            import librosa
+            self.metrics.count('bytes_read', os.path.getsize(file_path))
+            y, sr = librosa.load(file_path, sr=sr, offset=offset, duration=duration, res_type=res_type)
+            self.metrics.observe_array('signal', y)
+            return y, sr
+        
+        y, sr_native = self._read_soundfile(file_path, offset, duration)
+        if sr is not None and sr != sr_native:
+            import librosa
+            y = librosa.resample(y, orig_sr=sr_native, target_sr=sr, res_type=res_type)
+        else:
+            sr = sr_native
+        self.metrics.observe_array('signal', y)
         return y, sr
     
-    def save_classified_segments(self, signal, frames, labels, sr):
-        """Save voiced, unvoiced, and silent segments to separate MP3 files.
+    def _read_soundfile(self, file_path, offset, duration):
+        """Read a time range of a file as float32 mono samples.
+        
+        Returns:
+            y: Audio samples
+            sr: Native sample rate of the file
+        """
+        info = sf.info(file_path)
+        start = int(np.round(offset * info.samplerate))
+        stop = info.frames if duration is None else min(start + int(np.round(duration * info.samplerate)), info.frames)
+        
+        data = None
+        if info.format == 'WAV' and info.subtype in ('PCM_16', 'FLOAT'):
+            data = self._read_wav_memmap(file_path, info, start, stop)
+        if data is None:
+            data, _ = sf.read(file_path, start=start, stop=max(stop, start), dtype='float32', always_2d=True)
+        
+        # Bytes of the file covered by the range that was read
+        self.metrics.count('bytes_read', int(os.path.getsize(file_path) * (stop - start) / max(info.frames, 1)))
+        
+        # Downmix the same way librosa does
+        y = np.mean(data, axis=1) if data.shape[1] > 1 else data[:, 0]
+        return np.ascontiguousarray(y, dtype=np.float32), info.samplerate
+    
+    def _read_wav_memmap(self, file_path, info, start, stop):
+        """Read samples [start, stop) of a PCM_16 or float WAV through a memory map.
+        
+        Returns None if the data chunk cannot be located, so the caller can
+        fall back to soundfile.
+        """
+        dtype = np.dtype('<i2') if info.subtype == 'PCM_16' else np.dtype('<f4')
+        
+        data_offset = None
+        with open(file_path, 'rb') as f:
+            header = f.read(12)
+            if header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+                return None
+            # Walk the RIFF chunks up to the data chunk
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, chunk_size = chunk[:4], int.from_bytes(chunk[4:], 'little')
+                if chunk_id == b'data':
+                    data_offset = f.tell()
+                    break
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+        
+        frame_size = dtype.itemsize * info.channels
+        available = (os.path.getsize(file_path) - data_offset) // frame_size
+        if available < info.frames or stop <= start:
+            return None
+        
+        mapped = np.memmap(file_path, dtype=dtype, mode='r', offset=data_offset, shape=(info.frames, info.channels))
+        data = np.asarray(mapped[start:stop], dtype=np.float32)
+        if info.subtype == 'PCM_16':
+            data *= np.float32(1.0 / 32768)
+        return data
+    
+    def load_audio_blocks(self, file_path, sr=None, block_duration=30.0):
+        """Read an audio file as consecutive mono blocks of samples.
+        
+        Files readable by soundfile are decoded block by block, with a
+        streaming soxr resampler of the handler's res_type quality when the
+        native rate differs from sr, so memory does not grow with file
+        length. Other formats, and resamplers other than soxr, fall back to
+        load_audio and are split into blocks afterwards.
+        
+        Args:
+            file_path: Path to audio file
+            sr: Target sample rate (defaults to the handler's frame spec)
+            block_duration: Block length in seconds
+            
+        Yields:
+            block: float32 array of mono samples at sample rate sr
+        """
+        sr = sr or self.frame_spec.sr
+        try:
+            info = sf.info(file_path)
+        except RuntimeError:
+            info = None
+        
+        if info is None or (info.samplerate != sr and not self._has_stream_resampler(self.res_type)):
+            signal, sr = self.load_audio(file_path, sr=sr)
+            block_size = int(block_duration * sr)
+            for start in range(0, len(signal), block_size):
+                yield signal[start:start + block_size]
+            return
+        
+        resampler = None
+        if info.samplerate != sr:
+            import soxr
+            resampler = soxr.ResampleStream(info.samplerate, sr, 1, dtype='float32', quality=self.res_type)
+            # librosa.load trims/pads the resampled signal to this length
+            remaining = int(np.ceil(info.frames * sr / info.samplerate))
+        
+        block_size = int(block_duration * info.samplerate)
+        with sf.SoundFile(file_path) as f:
+            for block in f.blocks(blocksize=block_size, dtype='float32', always_2d=True):
+                # Downmix the same way librosa does
+                block = np.mean(block, axis=1) if block.shape[1] > 1 else block[:, 0]
+                if resampler is None:
+                    yield block
+                    continue
+                block = resampler.resample_chunk(block)[:remaining]
+                remaining -= len(block)
+                if len(block):
+                    yield block
+        
+        self.metrics.count('bytes_read', os.path.getsize(file_path))
+        
+        if resampler is not None:
+            tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)[:remaining]
+            remaining -= len(tail)
+            if remaining > 0:
+                tail = np.concatenate((tail, np.zeros(remaining, dtype=np.float32)))
+            if len(tail):
+                yield tail
+    
+    def _has_stream_resampler(self, res_type):
+        """Check whether res_type is a soxr quality and soxr (installed with librosa) is available."""
+        if not res_type.startswith('soxr_'):
+            return False
+        try:
+            import soxr
+        except ImportError:
+            return False
+        return hasattr(soxr, 'ResampleStream')
+    
+    @timed('export')
+    def save_classified_segments(self, signal, frames, labels, sr, hop_length=None, file_format=None):
+        """Save voiced, unvoiced, and silent segments to separate audio files.
+        
+        Each frame owns the hop_length samples starting at its first sample
+        (the last frame owns the rest of the signal), so every sample is
+        written exactly once. Runs of equal labels are streamed to the
+        output files without building the class signals in memory.
         
         Args:
             signal: Original audio signal
             frames: Extracted frames
             labels: Classification labels (2=voiced, 1=unvoiced, 0=silent)
             sr: Sample rate
+            hop_length: Frame stride in samples (defaults to the frames' hop size,
+                or the stride of the handler's frame spec at sr)
+            file_format: Output format and extension, e.g. 'mp3', 'wav', 'flac'
+                (defaults to the handler's file_format)
         """
-        frame_length = len(frames[0])
-        frame_stride = int(sr * 10 / 1000)  # Assuming 10ms frame stride
-        
-        # Initialize arrays for each type
-        voiced_signal = np.array([])
-        unvoiced_signal = np.array([])
-        silent_signal = np.array([])
-        
-        # Reconstruct signal segments for each class
-        for i, label in enumerate(labels):
-            # Get the corresponding segment from the original signal
-            start = i * frame_stride
-            end = min(start + frame_length, len(signal))
-            segment = signal[start:end]
-            
-            # Add segment to the appropriate class signal
-            if label == 2:  # Voiced
-                voiced_signal = np.append(voiced_signal, segment)
-            elif label == 1:  # Unvoiced
-                unvoiced_signal = np.append(unvoiced_signal, segment)
-            else:  # Silent
-                silent_signal = np.append(silent_signal, segment)
+        if hop_length is None:
+            hop_length = getattr(frames, 'hop_length', int(sr * self.frame_spec.frame_stride / 1000))
+        file_format = (file_format or self.file_format).lower()
+        
+        # Runs of equal labels with their start and end samples
+        segments = SegmentIndex.from_labels(labels, hop_length, len(signal), sr)
         
         # File paths in the output directory
-        voice_path = os.path.join(self.output_dir, 'voice.mp3')
-        unvoice_path = os.path.join(self.output_dir, 'unvoice.mp3')
-        silent_path = os.path.join(self.output_dir, 'silent.mp3')
+        paths = {
+            2: os.path.join(self.output_dir, f'voice.{file_format}'),
+            1: os.path.join(self.output_dir, f'unvoice.{file_format}'),
+            0: os.path.join(self.output_dir, f'silent.{file_format}')
+        }
+        lengths = {2: 0, 1: 0, 0: 0}
+        
+        # Stream each run to the file of its class
+        outputs = {label: sf.SoundFile(path, 'w', samplerate=sr, channels=1, format=file_format.upper())
+                   for label, path in paths.items()}
+        try:
+            for start, end, label in segments:
+                segment = signal[start:end]
+                outputs[label].write(segment)
+                lengths[label] += len(segment)
+        finally:
+            for output in outputs.values():
+                output.close()
         
-        # Save each class signal to a separate MP3 file
-        sf.write(voice_path, voiced_signal, sr)
-        sf.write(unvoice_path, unvoiced_signal, sr)
-        sf.write(silent_path, silent_signal, sr)
+        self.metrics.count('bytes_written', sum(os.path.getsize(path) for path in paths.values()))
         
-        print(f"Saved classified segments to:")
-        print(f"  {voice_path} ({len(voiced_signal)/sr:.2f} seconds)")
-        print(f"  {unvoice_path} ({len(unvoiced_signal)/sr:.2f} seconds)")
-        print(f"  {silent_path} ({len(silent_signal)/sr:.2f} seconds)")
+        voice_path, unvoice_path, silent_path = paths[2], paths[1], paths[0]
+        
+        self._log(f"Saved classified segments to:")
+        self._log(f"  {voice_path} ({lengths[2]/sr:.2f} seconds)")
+        self._log(f"  {unvoice_path} ({lengths[1]/sr:.2f} seconds)")
+        self._log(f"  {silent_path} ({lengths[0]/sr:.2f} seconds)")
         
         return voice_path, unvoice_path, silent_path
     
-    def process_audio_file(self, file_path, classifier, visualizer):
+    def load_and_classify(self, file_path, classifier, sr=None):
+        """Load an audio file and classify it, going through the cache if one is set.
+        
+        The file is analyzed at sr, by default the rate of the classifier's
+        frame spec.
+        
+        Returns:
+            signal: Audio signal
+            sr: Sample rate
+            frames: Extracted frames
+            features: Extracted features
+            labels: Classification labels (2=voiced, 1=unvoiced, 0=silent)
+        """
+        sr = sr or classifier.frame_spec.sr
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(file_path, sr, classifier, res_type=self.res_type, audio_backend=self.audio_backend)
+            cached = self.cache.get(key)
+            if cached is not None:
+                signal, features, labels = cached
+                frames = classifier.extract_frames(signal, sr, lazy=True)
+                return signal, sr, frames, features, labels
+        
+        signal, sr = self.load_audio(file_path, sr=sr)
+        # Keep the frames a strided view; the plots and exports read them block by block
+        frames = classifier.extract_frames(signal, sr, lazy=True)
+        features, labels = classifier.extract_features(frames, sr)
+        
+        if key is not None:
+            self.cache.put(key, signal, features, labels)
+        
+        return signal, sr, frames, features, labels
+    
+    def process_audio_file(self, file_path, classifier, visualizer=None):
         """Process an audio file and classify voiced/unvoiced segments.
         
         Args:
             file_path: Path to audio file (MP3, WAV, etc.)
             classifier: VoiceClassifier instance
-            visualizer: AudioVisualizer instance
+            visualizer: AudioVisualizer instance, or None to skip all plots
             
         Returns:
             features: Extracted features
             labels: Classification labels (2=voiced, 1=unvoiced, 0=silent)
         """
-        # Load audio
-        signal, sr = self.load_audio(file_path)
+        # Load audio and classify, reusing cached results when available
+        signal, sr, frames, features, labels = self.load_and_classify(file_path, classifier)
         
-        # Process with classifier
-        frames, features, labels = classifier.process(signal, sr)
-        
-        # Visualize results
-        plot_path = visualizer.plot_features(signal, sr, frames, labels, classifier)
-        
-        # Plot ZCR vs classification comparison
-        zcr_plot_path = visualizer.plot_zcr_classification_comparison(frames, labels, classifier)
+        if visualizer is not None:
+            # Visualize results
+            plot_path = visualizer.plot_features(signal, sr, frames, labels, classifier, features=features)
+            
+            # Plot ZCR vs classification comparison
+            zcr_plot_path = visualizer.plot_zcr_classification_comparison(frames, labels, classifier, features=features, sr=sr)
         
         # Save classified segments
         voice_path, unvoice_path, silent_path = self.save_classified_segments(signal, frames, labels, sr)
         
-        # Visualize pitch detection for some example frames
-        print("Generating pitch detection visualizations for example frames...")
+        # Save the run-length segment index for interval queries
+        segments = SegmentIndex.from_labels(labels, frames.hop_length, len(signal), sr)
+        segments_path = segments.save(os.path.join(self.output_dir, 'segments.npz'))
+        self.metrics.count('bytes_written', os.path.getsize(segments_path))
+        
+        # Save the per-frame features as a memory-mapped columnar store
+        store_path = self.save_feature_store(features, labels, sr, classifier)
+        
+        if visualizer is not None:
+            self._plot_pitch_examples(frames, labels, sr, classifier, visualizer)
+        
+        self._log(f"Processed {file_path}")
+        self._log(f"Sample rate: {sr} Hz")
+        self._log(f"Duration: {len(signal)/sr:.2f} seconds")
+        if visualizer is not None:
+            self._log(f"Results saved to '{plot_path}'")
+            self._log(f"ZCR vs Classification plot saved to '{zcr_plot_path}'")
+        self._log(f"Segment index ({len(segments)} segments) saved to '{segments_path}'")
+        self._log(f"Feature store ({len(labels)} frames) saved to '{store_path}'")
+        
+        # Print statistics about classification
+        total_frames = len(labels)
+        voiced_frames = np.sum(labels == 2)
+        unvoiced_frames = np.sum(labels == 1)
+        silent_frames = np.sum(labels == 0)
+        
+        self._log(f"Classification results:")
+        self._log(f"  Voiced frames: {voiced_frames} ({voiced_frames/total_frames*100:.1f}%)")
+        self._log(f"  Unvoiced frames: {unvoiced_frames} ({unvoiced_frames/total_frames*100:.1f}%)")
+        self._log(f"  Silent frames: {silent_frames} ({silent_frames/total_frames*100:.1f}%)")
+        
+        return features, labels
+    
+    def save_feature_store(self, features, labels, sr, classifier, path=None):
+        """Write features and labels to a new FeatureStore and return its path.
+        
+        Args:
+            features: Extracted features
+            labels: Classification labels (2=voiced, 1=unvoiced, 0=silent)
+            sr: Sample rate
+            classifier: VoiceClassifier that produced the features
+            path: Store directory (defaults to <output_dir>/features)
+        """
+        path = path or os.path.join(self.output_dir, 'features')
+        with classifier.open_store(path, sr) as store:
+            store.append(features, labels)
+        self.metrics.count('bytes_written', sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)))
+        return path
+    
+    def _plot_pitch_examples(self, frames, labels, sr, classifier, visualizer):
+        """Visualize pitch detection for a few example voiced and unvoiced frames."""
+        self._log("Generating pitch detection visualizations for example frames...")
         
         # Find indices of voiced and unvoiced frames for examples
         voiced_indices = np.where(labels == 2)[0]
@@ -128,29 +406,34 @@ class AudioFileHandler:
         example_indices = example_indices[:5]
         
         # Create pitch detection visualizations for selected examples
+        example_indices = [idx for idx in example_indices if idx < len(frames)]
+        visualizer.plot_pitch_detection_batch(frames[np.array(example_indices, dtype=int)], sr, classifier, example_indices)
         for idx in example_indices:
-            if idx < len(frames):
-                # Get the frame
-                frame = frames[idx]
-                # Create pitch detection visualization using the visualizer
-                visualizer.plot_pitch_detection(frame, sr, classifier, frame_index=idx)
-                print(f"  Created pitch detection visualization for frame {idx} (class: {labels[idx]})")
-        
-        print(f"Processed {file_path}")
-        print(f"Sample rate: {sr} Hz")
-        print(f"Duration: {len(signal)/sr:.2f} seconds")
-        print(f"Results saved to '{plot_path}'")
-        print(f"ZCR vs Classification plot saved to '{zcr_plot_path}'")
-        
-        # Print statistics about classification
-        total_frames = len(labels)
-        voiced_frames = np.sum(labels == 2)
-        unvoiced_frames = np.sum(labels == 1)
-        silent_frames = np.sum(labels == 0)
+            self._log(f"  Created pitch detection visualization for frame {idx} (class: {labels[idx]})")
+    
+    def process_audio_file_stream(self, file_path, classifier, sr=None, block_duration=30.0, store_path=None):
+        """Classify an audio file block by block with bounded memory.
         
-        print(f"Classification results:")
-        print(f"  Voiced frames: {voiced_frames} ({voiced_frames/total_frames*100:.1f}%)")
-        print(f"  Unvoiced frames: {unvoiced_frames} ({unvoiced_frames/total_frames*100:.1f}%)")
-        print(f"  Silent frames: {silent_frames} ({silent_frames/total_frames*100:.1f}%)")
+        Only classification is done; plots and segment export need the
+        whole signal and are not produced in this mode.
         
-        return features, labels 
\ No newline at end of file
+        Args:
+            file_path: Path to audio file (MP3, WAV, etc.)
+            classifier: VoiceClassifier instance
+            sr: Sample rate to analyze at (defaults to the classifier's frame spec)
+            block_duration: Block length in seconds
+            store_path: If given, the features of every block are appended to
+                a new FeatureStore in this directory
+            
+        Yields:
+            features: Extracted features for the frames completed by a block
+            labels: Classification labels (2=voiced, 1=unvoiced, 0=silent)
+        """
+        sr = sr or classifier.frame_spec.sr
+        blocks = self.load_audio_blocks(file_path, sr=sr, block_duration=block_duration)
+        if store_path is None:
+            yield from classifier.process_stream(blocks, sr)
+            return
+        with classifier.open_store(store_path, sr) as store:
+            yield from classifier.process_stream(blocks, sr, store=store)
+        self._log(f"Feature store ({len(store)} frames) saved to '{store_path}'")
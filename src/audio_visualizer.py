@@ -1,13 +1,16 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import os
+import time
+from src.metrics import NullMetrics, timed
 
 class AudioVisualizer:
     """Class for visualizing audio classification results"""
     
-    def __init__(self, output_dir='output'):
-        """Initialize with output directory."""
+    def __init__(self, output_dir='output', metrics=None):
+        """Initialize with output directory and an optional Metrics collector."""
         self.output_dir = output_dir
+        self.metrics = metrics if metrics is not None else NullMetrics()
         # Create main output directory
         os.makedirs(self.output_dir, exist_ok=True)
         # Define subdirectories for frame-level features
@@ -20,14 +23,28 @@ class AudioVisualizer:
         for dir_path in self.feature_dirs.values():
             os.makedirs(dir_path, exist_ok=True)
     
-    def plot_features(self, signal, sr, frames, labels, classifier):
-        """Plot signal and features."""
+    @timed('plot')
+    def plot_features(self, signal, sr, frames, labels, classifier, features=None):
+        """Plot signal and features.
+        
+        Args:
+            signal: Audio signal
+            sr: Sample rate
+            frames: Extracted frames
+            labels: Classification labels (2=voiced, 1=unvoiced, 0=silent)
+            classifier: VoiceClassifier instance
+            features: Feature matrix returned by classifier.process; computed
+                from frames if not given
+        """
         
         # Store reference to classifier for use in frame-level plots
         self.classifier = classifier
         
+        if features is None:
+            features, _ = classifier.extract_features(frames, sr, progress=False)
+        
         time = np.arange(len(signal)) / sr
-        frame_time = np.arange(len(frames)) * (0.01) # Assuming 10ms frame stride
+        frame_time = self._frame_times(frames, sr, classifier)
         
         fig, (ax1, ax2, ax3, ax4) = plt.subplots(4, 1, figsize=(12, 10))
         
@@ -37,14 +54,8 @@ class AudioVisualizer:
         ax1.set_xlabel('Time (s)')
         ax1.set_ylabel('Amplitude')
         
-        # Extract features for each frame
-        zcrs = np.zeros(len(frames))
-        energies = np.zeros(len(frames))
-        
-        for i, frame in enumerate(frames):
-            features = classifier.extract_features_from_frame(frame, sr)
-            zcrs[i] = features["zcr"]
-            energies[i] = features["energy"]
+        zcrs = classifier.feature_column(features, 'zcr')
+        energies = classifier.feature_column(features, 'energy')
         
         # Plot zero crossing rate
         ax2.plot(frame_time, zcrs)
@@ -78,6 +89,12 @@ class AudioVisualizer:
         
         return output_path 
 
+    def _frame_times(self, frames, sr, classifier):
+        """Start time in seconds of every frame, using the frames' hop size or the classifier's frame spec."""
+        hop_length = getattr(frames, 'hop_length', None) or classifier.frame_sizes(sr)[1]
+        return np.arange(len(frames)) * hop_length / sr
+    
+    @timed('plot')
     def plot_frame_features(self, frame, features, frame_index):
         """Plot features for a single frame.
         
@@ -136,27 +153,103 @@ class AudioVisualizer:
         plt.savefig(output_path)
         plt.close()
 
-    def plot_zcr_classification_comparison(self, frames, labels, classifier):
+    @timed('plot')
+    def plot_frame_features_batch(self, frames, features, frame_indices):
+        """Plot features for many frames, reusing one figure per feature type.
+        
+        Produces the plots of calling plot_frame_features for each frame,
+        but each figure layout is built once and only the line data and
+        title change between frames. tight_layout runs once per template
+        rather than per frame, so margins can differ slightly.
+        
+        Args:
+            frames: Sequence of audio frames
+            features: Sequence of feature dictionaries, one per frame
+            frame_indices: Frame index of each frame (used in file names)
+            
+        Returns:
+            paths: Saved image paths
+            images_per_second: Rendering throughput
+        """
+        start = time.perf_counter()
+        paths = []
+        
+        for feature_type in ('zcr', 'energy', 'pitch'):
+            fig, ax, line = self._feature_template(feature_type)
+            for frame, frame_features, frame_index in zip(frames, features, frame_indices):
+                frame = np.asarray(frame)
+                line.set_data(np.arange(len(frame)), frame**2 if feature_type == 'energy' else frame)
+                ax.relim()
+                ax.autoscale_view()
+                ax.set_title(f'{feature_type.title()}: {frame_features[feature_type]:.4f}')
+                
+                output_path = os.path.join(self.feature_dirs[feature_type], f'{frame_index}.png')
+                fig.savefig(output_path)
+                paths.append(output_path)
+            plt.close(fig)
+        
+        return paths, self._report_throughput(len(paths), start)
+    
+    def _feature_template(self, feature_type):
+        """Build the reusable figure of _plot_feature for one feature type.
+        
+        Returns:
+            fig, ax: The figure and its axes
+            line: Line whose data is replaced for every frame
+        """
+        fig, ax = plt.subplots(figsize=(10, 4))
+        line, = ax.plot([], [])
+        
+        if feature_type == 'zcr':
+            ax.axhline(y=0, color='r', linestyle='-')
+        
+        # Add threshold lines for relevant features
+        if feature_type == 'zcr' and hasattr(self, 'classifier'):
+            ax.axhline(y=self.classifier.zcr_threshold, color='g', linestyle='--', 
+                       label=f'ZCR Threshold = {self.classifier.zcr_threshold}')
+            ax.legend()
+        elif feature_type == 'energy' and hasattr(self, 'classifier'):
+            ax.axhline(y=self.classifier.energy_threshold, color='g', linestyle='--', 
+                       label=f'Energy Threshold = {self.classifier.energy_threshold}')
+            ax.legend()
+        
+        ax.set_title(f'{feature_type.title()}: 0.0000')
+        ax.set_xlabel('Sample')
+        ax.set_ylabel('Amplitude')
+        fig.tight_layout()
+        return fig, ax, line
+    
+    def _report_throughput(self, n_images, start):
+        """Record and return the images per second of a batch render."""
+        elapsed = time.perf_counter() - start
+        images_per_second = n_images / elapsed if elapsed > 0 else 0.0
+        self.metrics.count('images', n_images)
+        return images_per_second
+
+    @timed('plot')
+    def plot_zcr_classification_comparison(self, frames, labels, classifier, features=None, sr=None):
         """Plot ZCR values and classification results side by side with threshold.
         
         Args:
             frames: Extracted audio frames
             labels: Classification labels (2=voiced, 1=unvoiced, 0=silent)
             classifier: VoiceClassifier instance
+            features: Feature matrix returned by classifier.process; ZCR is
+                computed from frames if not given
+            sr: Sample rate, used for the time axis (defaults to the
+                classifier's frame spec)
         """
-        # Extract ZCR values for each frame
-        zcrs = np.zeros(len(frames))
-        sr = 16000  # Default sample rate, not critical for this visualization
-        
-        for i, frame in enumerate(frames):
-            features = classifier.extract_features_from_frame(frame, sr)
-            zcrs[i] = features["zcr"]
+        sr = sr or classifier.frame_spec.sr
+        if features is None:
+            zcrs = classifier.zero_crossing_rates(frames)
+        else:
+            zcrs = classifier.feature_column(features, 'zcr')
         
         # Create the plot
         fig, ax = plt.subplots(figsize=(14, 6))
         
         # Frame time for x-axis
-        frame_time = np.arange(len(frames)) * 0.01  # Assuming 10ms frame stride
+        frame_time = self._frame_times(frames, sr, classifier)
         
         # Plot ZCR values
         ax.plot(frame_time, zcrs, label='ZCR')
@@ -187,7 +280,55 @@ class AudioVisualizer:
         
         return output_path 
         
-    def plot_autocorrelation(self, autocorr, min_lag, max_lag, peak_idx, peak_value, threshold=0.3, title=None):
+    @timed('plot')
+    def plot_store_range(self, store, start_time=0.0, end_time=None):
+        """Plot ZCR, energy, pitch and classification of a time range of a FeatureStore.
+        
+        Only the frames in the range are read from the store's memory maps,
+        so any part of a long recording can be plotted without loading it.
+        Threshold lines come from the classifier settings in the store header.
+        
+        Args:
+            store: FeatureStore (or the path of one)
+            start_time: Range start in seconds
+            end_time: Range end in seconds (end of the store if None)
+        """
+        if isinstance(store, str):
+            from src.feature_store import FeatureStore
+            store = FeatureStore(store)
+        if end_time is None:
+            end_time = store.duration
+        columns = store.slice(start_time, end_time)
+        config = store.header.get("config", {})
+        frame_time = columns["time"]
+        
+        fig, axes = plt.subplots(4, 1, figsize=(12, 10), sharex=True)
+        panels = [
+            ('zcr', 'Zero Crossing Rate', 'ZCR', 'zcr_threshold'),
+            ('energy', 'Short-Time Energy', 'Energy', 'energy_threshold'),
+            ('pitch', 'Pitch', 'Pitch (Hz)', None),
+            ('label', 'Classification (2=voiced, 1=unvoiced, 0=silent)', 'Class', None)
+        ]
+        for ax, (column, title, ylabel, threshold) in zip(axes, panels):
+            ax.plot(frame_time, columns[column])
+            if threshold in config:
+                ax.axhline(y=config[threshold], color='r', linestyle='--', label=f'{ylabel} Threshold = {config[threshold]}')
+                ax.legend()
+            ax.set_title(title)
+            ax.set_ylabel(ylabel)
+        axes[3].set_ylim(-0.1, 2.1)
+        axes[3].set_xlabel('Time (s)')
+        
+        plt.tight_layout()
+        output_path = os.path.join(self.output_dir, f'store_{start_time:g}s_{end_time:g}s.png')
+        plt.savefig(output_path)
+        plt.close()
+        
+        return output_path
+    
+    @timed('plot')
+    def plot_autocorrelation(self, autocorr, min_lag, max_lag, peak_idx, peak_value, threshold=0.3, title=None,
+                             keep_open=False):
         """Plot autocorrelation function with pitch detection.
         
         Args:
@@ -198,6 +339,8 @@ class AudioVisualizer:
             peak_value: Value at peak
             threshold: Voicing decision threshold
             title: Optional title for the plot
+            keep_open: Leave the figure open for add_text_to_current_plot,
+                which saves and closes it
         """
         plt.figure(figsize=(12, 6))
         
@@ -235,9 +378,63 @@ class AudioVisualizer:
         output_path = os.path.join(self.feature_dirs['pitch'], f'autocorr_{frame_idx}.png')
         plt.savefig(output_path)
         
-        # Don't close the figure yet, in case text needs to be added
+        if not keep_open:
+            plt.close()
         return output_path
     
+    @timed('plot')
+    def plot_autocorrelation_batch(self, autocorrs, min_lag, max_lag, peak_lags, peak_values, frame_indices,
+                                   threshold=0.3):
+        """Plot the autocorrelation of many frames, reusing one figure.
+        
+        Produces the plots of plot_autocorrelation with the title
+        'Frame <index>: Autocorrelation Function for Pitch Detection', but
+        the figure, search range, threshold line and legend are built once;
+        only the curve, peak marker and title change between frames.
+        
+        Args:
+            autocorrs: Autocorrelation of each frame (n_frames, n_lags)
+            min_lag: Minimum lag for pitch detection
+            max_lag: Maximum lag for pitch detection
+            peak_lags: Lag of the detected peak of each frame
+            peak_values: Autocorrelation at each peak
+            frame_indices: Frame index of each frame (used in titles and file names)
+            threshold: Voicing decision threshold
+            
+        Returns:
+            paths: Saved image paths
+            images_per_second: Rendering throughput
+        """
+        start = time.perf_counter()
+        autocorrs = np.asarray(autocorrs)
+        if len(autocorrs) == 0:
+            return [], 0.0
+        
+        fig, ax = plt.subplots(figsize=(12, 6))
+        corr_line, = ax.plot(autocorrs[0], label='Autocorrelation')
+        ax.axvspan(min_lag, max_lag, alpha=0.2, color='green', label='Valid pitch range')
+        peak_marker, = ax.plot([0], [0], 'ro', markersize=8, label='Peak at lag 0')
+        ax.axhline(y=threshold, color='r', linestyle='--', label=f'Voicing threshold = {threshold}')
+        ax.set_xlabel('Lag (samples)')
+        ax.set_ylabel('Autocorrelation')
+        legend = ax.legend()
+        ax.grid(True, alpha=0.3)
+        ax.set_ylim(-0.5, 1.1)
+        
+        paths = []
+        for autocorr, peak_idx, peak_value, frame_index in zip(autocorrs, peak_lags, peak_values, frame_indices):
+            corr_line.set_ydata(autocorr)
+            peak_marker.set_data([int(peak_idx)], [peak_value])
+            legend.get_texts()[2].set_text(f'Peak at lag {int(peak_idx)}')
+            ax.set_title(f'Frame {frame_index}: Autocorrelation Function for Pitch Detection')
+            
+            output_path = os.path.join(self.feature_dirs['pitch'], f'autocorr_{frame_index}.png')
+            fig.savefig(output_path)
+            paths.append(output_path)
+        
+        plt.close(fig)
+        return paths, self._report_throughput(len(paths), start)
+    
     def add_text_to_current_plot(self, text, x=0.02, y=0.02):
         """Add text to the current matplotlib plot.
         
@@ -265,6 +462,7 @@ class AudioVisualizer:
         
         return output_path 
     
+    @timed('plot')
     def plot_pitch_detection(self, frame, sr, classifier, frame_index=None):
         """Visualize the pitch detection process for a frame.
         
@@ -277,23 +475,16 @@ class AudioVisualizer:
         # Calculate autocorrelation
         auto_corr = classifier.autocorrelation(frame)
         
-        # Get pitch parameters
-        frame_length_ms = 25
-        min_pitch = 50  # Hz
-        max_pitch = 500 # Hz
-        
-        min_lag = int(sr / max_pitch)
-        max_lag = int(sr / min_pitch)
-        
-        if max_lag >= len(auto_corr):
-            max_lag = len(auto_corr) - 1
+        # Get pitch parameters from the classifier
+        min_lag, max_lag = classifier.pitch_lag_range(sr, len(auto_corr))
+        threshold = classifier.voicing_threshold
         
         # Find the peak in the autocorrelation
         peak_idx = np.argmax(auto_corr[min_lag:max_lag]) + min_lag
         peak_value = auto_corr[peak_idx]
         
         # Determine if voiced
-        is_voiced = peak_value > 0.3
+        is_voiced = peak_value > threshold
         pitch = sr / peak_idx if is_voiced else 0
         
         # Create figure with two subplots
@@ -316,7 +507,7 @@ class AudioVisualizer:
         ax2.plot(peak_idx, peak_value, 'ro', markersize=8, label=f'Peak at lag {peak_idx}')
         
         # Add threshold line
-        ax2.axhline(y=0.3, color='r', linestyle='--', label=f'Voicing threshold = 0.3')
+        ax2.axhline(y=threshold, color='r', linestyle='--', label=f'Voicing threshold = {threshold}')
         
         # Add labels and legend for autocorrelation plot
         ax2.set_xlabel('Lag (samples)')
@@ -341,7 +532,7 @@ class AudioVisualizer:
         # Prepare classification info text
         info_text = f"ZCR: {zcr:.4f} (Threshold: {classifier.zcr_threshold})\n"
         info_text += f"Energy: {energy:.6f} (Threshold: {classifier.energy_threshold})\n"
-        info_text += f"Peak Value: {peak_value:.4f} (Threshold: 0.3)\n"
+        info_text += f"Peak Value: {peak_value:.4f} (Threshold: {threshold})\n"
         
         # Show classification logic
         is_voiced_by_classifier = (
@@ -375,4 +566,100 @@ class AudioVisualizer:
         plt.savefig(output_path)
         plt.close()
         
-        return output_path
\ No newline at end of file
+        return output_path
+    
+    @timed('plot')
+    def plot_pitch_detection_batch(self, frames, sr, classifier, frame_indices):
+        """Visualize the pitch detection process for many frames.
+        
+        Produces the plots of plot_pitch_detection, but the figure, axes,
+        legend and text box are built once; only the line data, peak marker
+        and text change between frames, and tight_layout runs once, so
+        margins can differ slightly. Autocorrelations and peaks are computed
+        for all frames at once.
+        
+        Args:
+            frames: Sequence of audio frames (all of the same length)
+            sr: Sample rate
+            classifier: VoiceClassifier instance
+            frame_indices: Frame index of each frame (used in titles and file names)
+            
+        Returns:
+            paths: Saved image paths
+            images_per_second: Rendering throughput
+        """
+        start = time.perf_counter()
+        frames = np.asarray(frames)
+        if len(frames) == 0:
+            return [], 0.0
+        
+        auto_corrs = classifier.autocorrelations(frames)
+        peak_values, peak_lags = classifier.voicing_peaks(frames, sr)
+        zcrs = classifier.zero_crossing_rates(frames)
+        energies = classifier.short_time_energies(frames)
+        
+        min_lag, max_lag = classifier.pitch_lag_range(sr, frames.shape[1])
+        threshold = classifier.voicing_threshold
+        
+        # Build the figure once
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
+        
+        wave_line, = ax1.plot(np.arange(frames.shape[1]), frames[0])
+        ax1.set_xlabel("Sample")
+        ax1.set_ylabel("Amplitude")
+        ax1.grid(True, alpha=0.3)
+        
+        corr_line, = ax2.plot(auto_corrs[0], label='Autocorrelation')
+        ax2.axvspan(min_lag, max_lag, alpha=0.2, color='green', label='Valid pitch range')
+        peak_marker, = ax2.plot([0], [0], 'ro', markersize=8, label='Peak at lag 0')
+        ax2.axhline(y=threshold, color='r', linestyle='--', label=f'Voicing threshold = {threshold}')
+        ax2.set_xlabel('Lag (samples)')
+        ax2.set_ylabel('Autocorrelation')
+        ax2.set_ylim(-0.5, 1.1)
+        ax2.grid(True, alpha=0.3)
+        legend = ax2.legend()
+        
+        suptitle = fig.suptitle('', fontsize=14)
+        info = fig.text(0.02, 0.02, '', bbox=dict(facecolor='white', alpha=0.8), 
+                        fontsize=9, verticalalignment='bottom')
+        plt.tight_layout()
+        plt.subplots_adjust(top=0.9)  # Make room for the suptitle
+        
+        paths = []
+        for i, frame_index in enumerate(frame_indices):
+            peak_idx, peak_value = int(peak_lags[i]), peak_values[i]
+            is_voiced = peak_value > threshold
+            pitch = sr / peak_idx if is_voiced else 0
+            
+            wave_line.set_ydata(frames[i])
+            ax1.relim()
+            ax1.autoscale_view()
+            ax1.set_title(f"Frame {frame_index} Waveform")
+            
+            corr_line.set_ydata(auto_corrs[i])
+            peak_marker.set_data([peak_idx], [peak_value])
+            legend.get_texts()[2].set_text(f'Peak at lag {peak_idx}')
+            
+            plt_title = f"Frame {frame_index}: Pitch Detection - {'Voiced' if is_voiced else 'Unvoiced'}"
+            if is_voiced:
+                plt_title += f" (Pitch: {pitch:.1f}Hz)"
+            suptitle.set_text(plt_title)
+            
+            if energies[i] < classifier.silence_threshold:
+                classification = "Silent (0)"
+            elif zcrs[i] < classifier.zcr_threshold and energies[i] > classifier.energy_threshold and is_voiced:
+                classification = "Voiced (2)"
+            else:
+                classification = "Unvoiced (1)"
+            
+            info.set_text(f"ZCR: {zcrs[i]:.4f} (Threshold: {classifier.zcr_threshold})\n"
+                          f"Energy: {energies[i]:.6f} (Threshold: {classifier.energy_threshold})\n"
+                          f"Peak Value: {peak_value:.4f} (Threshold: {threshold})\n"
+                          f"Classification: {classification}")
+            
+            output_path = os.path.join(self.feature_dirs['pitch'], f'frame_and_autocorr_{frame_index}.png')
+            fig.savefig(output_path)
+            paths.append(output_path)
+        
+        plt.close(fig)
+        return paths, self._report_throughput(len(paths), start)
@@ -0,0 +1,140 @@
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.voice_classifier import VoiceClassifier
+from src.audio_file_handler import AudioFileHandler
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.m4a', '.aac')
+
+# Per-process instances, created once by _init_worker and reused for every file
+_worker_classifier = None
+_worker_file_handler = None
+
+
+def _init_worker(classifier_kwargs, output_dir, audio_backend='auto', res_type='soxr_hq'):
+    """Create the classifier and file handler used by this worker process."""
+    global _worker_classifier, _worker_file_handler
+    _worker_classifier = VoiceClassifier(**classifier_kwargs)
+    _worker_file_handler = AudioFileHandler(output_dir=output_dir, audio_backend=audio_backend, res_type=res_type)
+
+
+def _classify_file(file_path):
+    """Classify one file in a worker and return its summary entry.
+    
+    Any error is caught and reported in the entry so one bad file does not
+    stop the batch.
+    """
+    start = time.perf_counter()
+    try:
+        signal, sr = _worker_file_handler.load_audio(file_path, sr=_worker_classifier.frame_spec.sr)
+        loaded = time.perf_counter()
+        
+        frames, features, labels = _worker_classifier.process(signal, sr, progress=False)
+        classified = time.perf_counter()
+    except Exception as e:
+        return {
+            "file": file_path,
+            "status": "error",
+            "error": f"{type(e).__name__}: {e}",
+            "timings": {"total": time.perf_counter() - start}
+        }
+    
+    return {
+        "file": file_path,
+        "status": "ok",
+        "sample_rate": sr,
+        "duration": len(signal) / sr,
+        "frames": len(labels),
+        "label_counts": {
+            "voiced": int(np.sum(labels == 2)),
+            "unvoiced": int(np.sum(labels == 1)),
+            "silent": int(np.sum(labels == 0))
+        },
+        "timings": {
+            "load": loaded - start,
+            "classify": classified - loaded,
+            "total": classified - start
+        }
+    }
+
+
+class BatchProcessor:
+    """Class for classifying many audio files across a process pool"""
+    
+    def __init__(self, jobs=1, output_dir='output', classifier_kwargs=None, audio_backend='auto', res_type='soxr_hq'):
+        """Initialize with the number of worker processes, classifier settings and
+        the audio backend and resampler the workers load files with."""
+        self.jobs = max(int(jobs), 1)
+        self.output_dir = output_dir
+        self.classifier_kwargs = classifier_kwargs or {}
+        self.audio_backend = audio_backend
+        self.res_type = res_type
+    
+    def collect_files(self, source):
+        """Resolve a directory, glob pattern or manifest file to a list of audio files.
+        
+        Args:
+            source: Directory (searched recursively for audio files), glob
+                pattern, or text manifest with one path per line (relative
+                paths are resolved against the manifest's directory)
+        
+        Returns:
+            files: Sorted list of file paths (manifest order is kept)
+        """
+        if os.path.isdir(source):
+            files = []
+            for root, _, names in os.walk(source):
+                files.extend(os.path.join(root, name) for name in names
+                             if name.lower().endswith(AUDIO_EXTENSIONS))
+            return sorted(files)
+        
+        if os.path.isfile(source) and not source.lower().endswith(AUDIO_EXTENSIONS):
+            base_dir = os.path.dirname(source)
+            files = []
+            with open(source) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        files.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+            return files
+        
+        return sorted(glob.glob(source, recursive=True))
+    
+    def run(self, files):
+        """Classify all files and return the batch summary.
+        
+        Returns:
+            summary: Dictionary with per-file entries and batch totals
+        """
+        start = time.perf_counter()
+        
+        if self.jobs == 1:
+            _init_worker(self.classifier_kwargs, self.output_dir, self.audio_backend, self.res_type)
+            results = [_classify_file(file_path) for file_path in files]
+        else:
+            # Forking a process whose numba or BLAS threads are running can deadlock the workers
+            initargs = (self.classifier_kwargs, self.output_dir, self.audio_backend, self.res_type)
+            with ProcessPoolExecutor(max_workers=self.jobs, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker, initargs=initargs) as pool:
+                results = list(pool.map(_classify_file, files, chunksize=max(len(files) // (self.jobs * 4), 1)))
+        
+        return {
+            "jobs": self.jobs,
+            "total_files": len(results),
+            "failed_files": sum(1 for r in results if r["status"] != "ok"),
+            "wall_time": time.perf_counter() - start,
+            "files": results
+        }
+    
+    def write_summary(self, summary, path):
+        """Write the batch summary as JSON and return its path."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        return path
@@ -0,0 +1,602 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from urllib.parse import parse_qsl, urlsplit
+import numpy as np
+import soundfile as sf
+from src.voice_classifier import VoiceClassifier
+from src.streaming_voice_classifier import StreamingVoiceClassifier
+from src.segment_index import SegmentIndex
+from src.metrics import NullMetrics
+
+LABEL_NAMES = {0: 'silent', 1: 'unvoiced', 2: 'voiced'}
+PCM_FORMATS = {'pcm16': np.dtype('<i2'), 'f32': np.dtype('<f4')}
+HTTP_REASONS = {
+    101: 'Switching Protocols', 200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 411: 'Length Required', 413: 'Payload Too Large',
+    500: 'Internal Server Error'
+}
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_TEXT, WS_BINARY, WS_CLOSE, WS_PING, WS_PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+class HTTPError(Exception):
+    """Error sent to the client as a JSON response with the given status code."""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def pcm_to_float(data, pcm_format='pcm16'):
+    """Convert raw little-endian PCM bytes to float32 samples.
+    
+    Args:
+        data: PCM bytes
+        pcm_format: 'pcm16' (16-bit integers, scaled by 1/32768) or 'f32' (32-bit floats)
+    
+    Returns:
+        samples: 1-D float32 array
+    """
+    if pcm_format not in PCM_FORMATS:
+        raise HTTPError(400, f"Unknown PCM format '{pcm_format}' (expected one of {', '.join(PCM_FORMATS)})")
+    dtype = PCM_FORMATS[pcm_format]
+    if len(data) % dtype.itemsize:
+        raise HTTPError(400, f"PCM data length {len(data)} is not a multiple of {dtype.itemsize} bytes")
+    samples = np.frombuffer(data, dtype=dtype).astype(np.float32)
+    if pcm_format == 'pcm16':
+        samples *= 1 / 32768
+    return samples
+
+
+def sample_rate_param(query, default):
+    """Return the sr query parameter as a positive integer (default if it is not set)."""
+    value = query.get('sr')
+    if value is None:
+        return default
+    try:
+        sr = int(value)
+    except ValueError:
+        raise HTTPError(400, f"Sample rate must be an integer, got '{value}'")
+    if sr <= 0:
+        raise HTTPError(400, f"Sample rate must be positive, got {sr}")
+    return sr
+
+
+class FrameBatcher:
+    """Gathers the audio of concurrent requests into shared vectorized batches.
+    
+    Requests submit whole signals (uploads) or frame matrices (streams) and
+    await the result. A background task takes the first queued request,
+    waits up to max_wait_ms for more while the batch holds fewer than
+    max_batch_frames frames, and classifies everything in the executor: all
+    signals with one VoiceClassifier.process_many call and all frame
+    matrices with one extract_features call. Features and labels are then
+    split back per request. Only one batch runs at a time, so requests that
+    arrive during a batch are collected into the next one.
+    """
+    
+    def __init__(self, classifier, sr, executor, max_batch_frames=16384, max_wait_ms=5.0, metrics=None,
+                 frame_length=None, frame_stride=None):
+        """Initialize the batcher.
+        
+        Args:
+            classifier: VoiceClassifier used for every batch
+            sr: Sample rate of the submitted audio
+            executor: Executor the batches run in
+            max_batch_frames: Stop collecting once a batch has this many frames
+            max_wait_ms: Longest time to wait for more requests after the first one
+            metrics: Optional Metrics collector
+            frame_length: Frame length in ms for submitted signals (defaults to
+                the classifier's frame spec)
+            frame_stride: Frame stride in ms for submitted signals (defaults to
+                the classifier's frame spec)
+        """
+        self.classifier = classifier
+        self.sr = sr
+        self.executor = executor
+        self.max_batch_frames = max_batch_frames
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        self.frame_length = classifier.frame_spec.frame_length if frame_length is None else frame_length
+        self.frame_stride = classifier.frame_spec.frame_stride if frame_stride is None else frame_stride
+        self.frame_samples, self.hop_length = classifier.frame_sizes(sr, self.frame_length, self.frame_stride)
+        self.queue = None
+        self.task = None
+        self.batches = 0
+        self.batched_requests = 0
+        self.batched_frames = 0
+    
+    def start(self):
+        """Start the batching task on the running event loop."""
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self):
+        """Cancel the batching task."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+    
+    async def classify(self, frames):
+        """Classify frames as part of the next shared batch.
+        
+        Args:
+            frames: Frame matrix or WindowedFrames view
+        
+        Returns:
+            features: Array of shape (n_frames, 3) with zcr, energy and pitch
+            labels: Classification labels (2=voiced, 1=unvoiced, 0=silent)
+        """
+        return await self._submit(frames, False, len(frames))
+    
+    async def classify_signal(self, signal):
+        """Frame and classify a whole signal as part of the next shared batch.
+        
+        Returns the same features and labels as VoiceClassifier.process.
+        """
+        n_frames = self.classifier.frame_count(len(signal), self.frame_samples, self.hop_length)
+        return await self._submit(signal, True, n_frames)
+    
+    async def _submit(self, payload, is_signal, n_frames):
+        """Queue a signal or frame matrix and wait for its features and labels."""
+        if n_frames == 0:
+            return np.zeros((0, 3), dtype=self.classifier.dtype), np.zeros(0, dtype=self.classifier.dtype)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((payload, is_signal, n_frames, future))
+        return await future
+    
+    async def _run(self):
+        """Collect queued requests into batches and classify them, forever."""
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self.queue.get()]
+            n_frames = jobs[0][2]
+            deadline = loop.time() + self.max_wait
+            while n_frames < self.max_batch_frames:
+                timeout = deadline - loop.time()
+                try:
+                    if timeout <= 0:
+                        job = self.queue.get_nowait()
+                    else:
+                        job = await asyncio.wait_for(self.queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                jobs.append(job)
+                n_frames += job[2]
+            
+            try:
+                results = await loop.run_in_executor(self.executor, self._classify_batch,
+                                                     [(payload, is_signal) for payload, is_signal, _, _ in jobs])
+            except Exception as e:
+                for job in jobs:
+                    if not job[3].done():
+                        job[3].set_exception(e)
+                continue
+            
+            self.batches += 1
+            self.batched_requests += len(jobs)
+            self.batched_frames += n_frames
+            self.metrics.count('batches')
+            self.metrics.count('batched_requests', len(jobs))
+            
+            for job, result in zip(jobs, results):
+                # The request may have been cancelled (client went away) in the meantime
+                if not job[3].done():
+                    job[3].set_result(result)
+    
+    def _classify_batch(self, items):
+        """Classify the signals and frame matrices of a batch.
+        
+        Args:
+            items: List of (payload, is_signal)
+            
+        Returns:
+            results: (features, labels) per item, in order
+        """
+        signals = [payload for payload, is_signal in items if is_signal]
+        frame_blocks = [np.asarray(payload) for payload, is_signal in items if not is_signal]
+        
+        signal_results = iter(())
+        if signals:
+            signal_results = iter(self.classifier.process_many(signals, self.sr, self.frame_length, self.frame_stride))
+        
+        frame_results = iter(())
+        if frame_blocks:
+            frames = frame_blocks[0] if len(frame_blocks) == 1 else np.concatenate(frame_blocks)
+            self.metrics.observe_array('service_batch', frames)
+            features, labels = self.classifier.extract_features(frames, self.sr, progress=False)
+            offsets = np.cumsum([0] + [len(block) for block in frame_blocks])
+            frame_results = iter([(features[start:end], labels[start:end])
+                                  for start, end in zip(offsets[:-1], offsets[1:])])
+        
+        return [next(signal_results) if is_signal else next(frame_results) for _, is_signal in items]
+
+
+class ClassificationService:
+    """Local asyncio HTTP service around VoiceClassifier.
+    
+    Uses only the standard library (plus the numpy and soundfile the rest of
+    the package needs), so it can be run and load-tested on one machine.
+    
+    Endpoints:
+        POST /classify: Classify an uploaded file (WAV, FLAC, OGG, ... as the
+            request body or a multipart/form-data upload) or raw PCM
+            (?format=pcm16 or ?format=f32, with ?sr=<rate>). Returns labels,
+            segments and label counts as JSON. ?labels=0 leaves out the
+            per-frame labels and ?features=1 adds the feature rows.
+        GET /health: Service status and batching statistics.
+        GET /stream: WebSocket endpoint. Binary messages carry PCM chunks
+            (?format=pcm16 or ?format=f32) and each is answered with the labels
+            of the frames it completes. A text message "end" (or closing the
+            socket) classifies the tail frames and returns the segments of
+            the whole stream.
+    
+    Decoding runs in a thread pool and framing and classification in shared
+    batches (see FrameBatcher), so the event loop stays free to accept
+    requests.
+    """
+    
+    def __init__(self, classifier=None, sr=None, host='127.0.0.1', port=8000, workers=None,
+                 max_batch_frames=16384, max_wait_ms=5.0, max_body_mb=100, metrics=None, verbose=True):
+        """Initialize the service.
+        
+        Args:
+            classifier: VoiceClassifier instance (a default one is created if None)
+            sr: Sample rate audio is classified at (uploads are resampled to it;
+                defaults to the classifier's frame spec)
+            host: Address to listen on
+            port: Port to listen on (0 picks a free port)
+            workers: Threads for decoding and classification (defaults to the CPU count)
+            max_batch_frames: Largest number of frames classified in one shared batch
+            max_wait_ms: Longest time a request waits for others to join its batch
+            max_body_mb: Largest accepted request body or WebSocket message in MB
+            metrics: Optional Metrics collector
+            verbose: Whether to print the listening address
+        """
+        self.classifier = classifier if classifier is not None else VoiceClassifier(progress=False)
+        self.sr = self.classifier.frame_spec.sr if sr is None else sr
+        self.host = host
+        self.port = port
+        self.max_body_bytes = int(max_body_mb * 1024 * 1024)
+        self.metrics = metrics if metrics is not None else NullMetrics()
+        self.verbose = verbose
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self.batcher = FrameBatcher(self.classifier, self.sr, self.executor, max_batch_frames=max_batch_frames,
+                                    max_wait_ms=max_wait_ms, metrics=self.metrics)
+        self.server = None
+        self.requests = 0
+    
+    async def start(self):
+        """Start listening and batching on the running event loop."""
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Report the real port when port 0 was requested
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.verbose:
+            print(f"Serving voice classification on http://{self.host}:{self.port}")
+    
+    async def stop(self):
+        """Stop listening and cancel the batching task."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        await self.batcher.stop()
+    
+    def run(self):
+        """Run the service until interrupted."""
+        async def serve():
+            await self.start()
+            try:
+                await self.server.serve_forever()
+            finally:
+                await self.stop()
+        
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.executor.shutdown(wait=False)
+    
+    async def _handle_connection(self, reader, writer):
+        """Serve HTTP requests on one connection until it is closed."""
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, query, headers, body = request
+                    if path == '/stream' and headers.get('upgrade', '').lower() == 'websocket':
+                        await self._handle_websocket(reader, writer, headers, query)
+                        break
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, payload = 200, await self._route(method, path, query, headers, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                
+                await self._send_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _read_request(self, reader):
+        """Read one HTTP request.
+        
+        Returns:
+            (method, path, query, headers, body), or None when the client
+            closed the connection
+        """
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise HTTPError(400, "Incomplete request headers")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Request headers too large")
+        
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, f"Malformed request line '{lines[0]}'")
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query))
+        
+        body = b''
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(411, "Chunked request bodies are not supported, send Content-Length")
+        length = int(headers.get('content-length', 0) or 0)
+        if length > self.max_body_bytes:
+            raise HTTPError(413, f"Request body of {length} bytes exceeds the limit of {self.max_body_bytes}")
+        if length:
+            body = await reader.readexactly(length)
+        return method.upper(), url.path, query, headers, body
+    
+    async def _send_response(self, writer, status, payload, keep_alive):
+        """Send a JSON response."""
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+    
+    async def _route(self, method, path, query, headers, body):
+        """Dispatch a request to its endpoint and return the JSON payload."""
+        if path == '/classify':
+            if method != 'POST':
+                raise HTTPError(405, "Use POST for /classify")
+            return await self.classify_request(body, headers.get('content-type', ''), query)
+        if path == '/health':
+            if method != 'GET':
+                raise HTTPError(405, "Use GET for /health")
+            return self.health()
+        if path == '/stream':
+            raise HTTPError(400, "/stream requires a WebSocket upgrade")
+        raise HTTPError(404, f"Unknown path '{path}'")
+    
+    def health(self):
+        """Return the service status and batching statistics."""
+        return {
+            "status": "ok",
+            "sample_rate": self.sr,
+            "requests": self.requests,
+            "batches": self.batcher.batches,
+            "batched_requests": self.batcher.batched_requests,
+            "batched_frames": self.batcher.batched_frames,
+            "config": self.classifier.get_config()
+        }
+    
+    async def classify_request(self, body, content_type, query):
+        """Decode an uploaded file or raw PCM and classify it in a shared batch.
+        
+        Args:
+            body: Request body
+            content_type: Content-Type header of the request
+            query: Query parameters (format, sr, labels, features)
+        
+        Returns:
+            Dictionary with labels, segments and label counts
+        """
+        start = time.perf_counter()
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        signal = await loop.run_in_executor(self.executor, self.decode_audio, body, content_type, query)
+        
+        features, labels = await self.batcher.classify_signal(signal)
+        
+        result = self._result(labels, self.batcher.hop_length, len(signal))
+        if query.get('labels', '1') == '0':
+            del result['labels']
+        if query.get('features') == '1':
+            result['features'] = features.tolist()
+        result['seconds'] = time.perf_counter() - start
+        return result
+    
+    def decode_audio(self, body, content_type, query):
+        """Decode a request body to mono float32 samples at the service rate.
+        
+        Raw PCM is expected when the format query parameter is set or the
+        content type is audio/L16; anything else is decoded with soundfile.
+        """
+        if content_type.lower().startswith('multipart/form-data'):
+            body, content_type = self._multipart_file(body, content_type)
+        if not body:
+            raise HTTPError(400, "Empty request body")
+        
+        pcm_format = query.get('format')
+        if pcm_format is None and content_type.lower().startswith('audio/l16'):
+            pcm_format = 'pcm16'
+        
+        if pcm_format is not None:
+            samples = pcm_to_float(body, pcm_format)
+            sr = sample_rate_param(query, self.sr)
+        else:
+            try:
+                data, sr = sf.read(io.BytesIO(body), dtype='float32', always_2d=True)
+            except RuntimeError as e:
+                raise HTTPError(400, f"Could not decode audio: {e}")
+            # Downmix the same way AudioFileHandler does
+            samples = np.mean(data, axis=1) if data.shape[1] > 1 else data[:, 0]
+            samples = np.ascontiguousarray(samples, dtype=np.float32)
+        
+        if sr != self.sr:
+            import librosa
+            samples = librosa.resample(samples, orig_sr=sr, target_sr=self.sr, res_type='soxr_hq')
+        return samples
+    
+    def _multipart_file(self, body, content_type):
+        """Return the content and content type of the file part of a multipart upload."""
+        message = BytesParser().parsebytes(b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+        if message.is_multipart():
+            for part in message.get_payload():
+                if part.get_filename() or part.get_param('name', header='content-disposition') in ('file', 'audio'):
+                    return part.get_payload(decode=True) or b'', part.get_content_type()
+        raise HTTPError(400, "No file part in the multipart upload")
+    
+    def _result(self, labels, hop_length, n_samples):
+        """Build the JSON result for classified labels."""
+        segments = SegmentIndex.from_labels(labels, hop_length, n_samples, self.sr)
+        return {
+            "sample_rate": self.sr,
+            "duration": n_samples / self.sr,
+            "frames": len(labels),
+            "hop_length": hop_length,
+            "label_counts": {
+                "voiced": int(np.sum(labels == 2)),
+                "unvoiced": int(np.sum(labels == 1)),
+                "silent": int(np.sum(labels == 0))
+            },
+            "segments": [{"start": start, "end": end, "label": LABEL_NAMES[int(label)]}
+                         for start, end, label in segments.to_seconds()],
+            "labels": labels.astype(int).tolist()
+        }
+    
+    async def _handle_websocket(self, reader, writer, headers, query):
+        """Classify a PCM stream sent over a WebSocket connection."""
+        key = headers.get('sec-websocket-key')
+        if not key:
+            raise HTTPError(400, "Missing Sec-WebSocket-Key header")
+        pcm_format = query.get('format', 'pcm16')
+        if pcm_format not in PCM_FORMATS:
+            raise HTTPError(400, f"Unknown PCM format '{pcm_format}' (expected one of {', '.join(PCM_FORMATS)})")
+        if sample_rate_param(query, self.sr) != self.sr:
+            raise HTTPError(400, f"Streams must be sent at {self.sr} Hz")
+        
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write((f"HTTP/1.1 101 {HTTP_REASONS[101]}\r\n"
+                      f"Upgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+        
+        self.requests += 1
+        stream = StreamingVoiceClassifier(self.classifier, sr=self.sr)
+        all_labels = []
+        while True:
+            opcode, payload = await self._read_ws_message(reader, writer)
+            done = opcode == WS_CLOSE or (opcode == WS_TEXT and payload.strip() == b'end')
+            if done:
+                frames = stream.tail_frames()
+            elif opcode == WS_BINARY:
+                try:
+                    frames = stream.next_frames(pcm_to_float(payload, pcm_format))
+                except HTTPError as e:
+                    await self._send_ws(writer, WS_TEXT, json.dumps({"error": str(e)}).encode())
+                    continue
+            else:
+                continue
+            
+            frame_offset = stream.frames_emitted - len(frames)
+            features, labels = await self.batcher.classify(frames)
+            all_labels.append(labels)
+            message = {"frame_offset": frame_offset, "labels": labels.astype(int).tolist()}
+            if done:
+                # Summary of the whole stream; its per-frame labels were already sent
+                summary = self._result(np.concatenate(all_labels), stream.frame_stride, stream.samples_seen)
+                del summary['labels']
+                message.update(summary)
+                message["done"] = True
+            if opcode != WS_CLOSE:
+                await self._send_ws(writer, WS_TEXT, json.dumps(message).encode())
+            if done:
+                await self._send_ws(writer, WS_CLOSE, struct.pack('!H', 1000))
+                break
+    
+    async def _read_ws_message(self, reader, writer):
+        """Read one complete WebSocket message, answering pings on the way.
+        
+        Returns:
+            (opcode, payload) of a data or close message
+        """
+        opcode, message = None, b''
+        while True:
+            first, second = await reader.readexactly(2)
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', await reader.readexactly(8))[0]
+            if len(message) + length > self.max_body_bytes:
+                raise ConnectionError("WebSocket message too large")
+            mask = await reader.readexactly(4) if second & 0x80 else None
+            payload = await reader.readexactly(length)
+            if mask is not None:
+                masked = np.frombuffer(payload, dtype=np.uint8)
+                payload = (masked ^ np.resize(np.frombuffer(mask, dtype=np.uint8), length)).tobytes()
+            
+            frame_opcode = first & 0x0F
+            if frame_opcode == WS_PING:
+                await self._send_ws(writer, WS_PONG, payload)
+                continue
+            if frame_opcode == WS_PONG:
+                continue
+            if frame_opcode == WS_CLOSE:
+                return WS_CLOSE, payload
+            if frame_opcode:
+                opcode = frame_opcode
+            message += payload
+            if first & 0x80:
+                return opcode, message
+    
+    async def _send_ws(self, writer, opcode, payload):
+        """Send one unmasked WebSocket frame."""
+        length = len(payload)
+        if length < 126:
+            head = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 1 << 16:
+            head = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            head = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        writer.write(head + payload)
+        await writer.drain()
@@ -0,0 +1,146 @@
+import os
+import numpy as np
+
+# Per-process visualizer, created once by _init_worker
+_worker_visualizer = None
+
+
+def _init_worker(output_dir, classifier_config):
+    """Set up a headless matplotlib backend and the visualizer of this worker."""
+    global _worker_visualizer
+    import matplotlib
+    matplotlib.use('Agg')
+    from src.audio_visualizer import AudioVisualizer
+    from src.voice_classifier import VoiceClassifier
+    
+    _worker_visualizer = AudioVisualizer(output_dir=output_dir)
+    # Only the thresholds are drawn on the frame plots, so skip loading a compiled backend
+    _worker_visualizer.classifier = VoiceClassifier(**dict(classifier_config, backend='numpy'))
+
+
+def _render_frames(items):
+    """Render the debug plots of a chunk of (frame_index, frame, features) items."""
+    frame_indices, frames, features = zip(*items)
+    _worker_visualizer.plot_frame_features_batch(frames, features, frame_indices)
+    return len(items)
+
+
+class DebugFrameRenderer:
+    """Renders per-frame debug plots off the classification hot path.
+    
+    A sample of frames is chosen with one of the sampling policies and
+    their plots are drawn by a pool of worker processes on the Agg backend
+    while classification continues.
+    
+    Policies:
+        'every_nth': every `every`-th frame
+        'stratified': up to `per_class` frames of each class, spread evenly
+        'transitions': frames within `context` frames of a class change
+        'all': every frame
+    """
+    
+    POLICIES = ('every_nth', 'stratified', 'transitions', 'all')
+    
+    def __init__(self, output_dir='output', policy='every_nth', every=100, per_class=20, context=2,
+                 jobs=None, chunk_size=16):
+        """Initialize the renderer.
+        
+        Args:
+            output_dir: Directory the visualizer writes the zcr/energy/pitch plots to
+            policy: Sampling policy (see class docstring)
+            every: Stride for 'every_nth'
+            per_class: Frames per class for 'stratified'
+            context: Frames on each side of a transition for 'transitions'
+            jobs: Number of worker processes (defaults to the CPU count)
+            chunk_size: Frames sent to a worker per task
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown debug sampling policy '{policy}', expected one of {self.POLICIES}")
+        self.output_dir = output_dir
+        self.policy = policy
+        self.every = max(int(every), 1)
+        self.per_class = per_class
+        self.context = context
+        self.jobs = jobs or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.pool = None
+        self.futures = []
+    
+    def select_frames(self, labels, frame_offset=0):
+        """Return the sorted indices of the frames to render for these labels.
+        
+        frame_offset is the index of the first frame in the whole signal, so
+        'every_nth' keeps its stride across consecutive blocks of a stream.
+        """
+        labels = np.asarray(labels)
+        n_frames = len(labels)
+        
+        if self.policy == 'all':
+            return np.arange(n_frames)
+        
+        if self.policy == 'every_nth':
+            return np.arange(-frame_offset % self.every, n_frames, self.every)
+        
+        if self.policy == 'stratified':
+            selected = []
+            for label in np.unique(labels):
+                indices = np.flatnonzero(labels == label)
+                count = min(self.per_class, len(indices))
+                selected.append(indices[np.linspace(0, len(indices) - 1, count).astype(int)])
+            return np.unique(np.concatenate(selected)) if selected else np.zeros(0, dtype=int)
+        
+        # Transitions: first frame of every new run plus its neighbours
+        change_points = np.flatnonzero(np.diff(labels)) + 1
+        offsets = np.arange(-self.context, self.context)
+        indices = (change_points[:, None] + offsets[None, :]).ravel()
+        return np.unique(indices[(indices >= 0) & (indices < n_frames)])
+    
+    def submit(self, frames, features, labels, classifier, frame_offset=0):
+        """Queue the debug plots of the selected frames and return immediately.
+        
+        Args:
+            frames: Extracted frames
+            features: Feature matrix from the classifier
+            labels: Classification labels
+            classifier: VoiceClassifier instance (for thresholds and column names)
+            frame_offset: Index of the first frame in the whole signal; plots
+                are named by that index, so blocks of a stream do not
+                overwrite each other
+            
+        Returns:
+            Number of frames queued
+        """
+        indices = self.select_frames(labels, frame_offset)
+        if len(indices) == 0:
+            return 0
+        
+        if self.pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # Forking a process whose numba or BLAS threads are running can deadlock the workers
+            self.pool = ProcessPoolExecutor(max_workers=self.jobs, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker, initargs=(self.output_dir, classifier.get_config()))
+        
+        selected_frames = np.asarray(frames[indices])
+        columns = {name: classifier.feature_column(features, name)[indices] for name in classifier.FEATURE_NAMES}
+        
+        items = [(frame_offset + int(frame_index), selected_frames[i], {name: float(columns[name][i]) for name in columns})
+                 for i, frame_index in enumerate(indices)]
+        for start in range(0, len(items), self.chunk_size):
+            self.futures.append(self.pool.submit(_render_frames, items[start:start + self.chunk_size]))
+        
+        return len(items)
+    
+    def wait(self):
+        """Block until all queued plots are written and return how many frames were rendered."""
+        rendered = sum(future.result() for future in self.futures)
+        self.futures = []
+        return rendered
+    
+    def close(self):
+        """Wait for queued plots and shut down the worker pool."""
+        rendered = self.wait()
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        return rendered
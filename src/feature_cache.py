@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+class FeatureCache:
+    """Content-addressed on-disk cache of decoded audio, features and labels.
+    
+    Entries are keyed by the hash of the audio file content together with
+    the sample rate, decoding settings, framing parameters and classifier
+    settings, and stored
+    as uncompressed .npz files. When the cache grows past max_size_mb the
+    least recently used entries are removed.
+    """
+    
+    def __init__(self, cache_dir='.cache/features', max_size_mb=1024):
+        """Initialize with the cache directory and its size limit in MB."""
+        self.cache_dir = cache_dir
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def make_key(self, file_path, sr, classifier, frame_length=None, frame_stride=None, res_type=None, audio_backend=None):
+        """Build the cache key for a file analyzed with the given settings.
+        
+        Args:
+            file_path: Path to audio file
+            sr: Sample rate the file is loaded at
+            classifier: VoiceClassifier instance
+            frame_length: Frame length in ms (defaults to the classifier's frame spec)
+            frame_stride: Frame stride in ms (defaults to the classifier's frame spec)
+            res_type: Resampler the file is decoded with
+            audio_backend: Audio backend the file is decoded with
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        
+        frame_length, frame_stride = classifier.frame_sizes(sr, frame_length, frame_stride)
+        params = dict(classifier.get_config(), sr=sr, frame_length=frame_length, frame_stride=frame_stride,
+                      res_type=res_type, audio_backend=audio_backend)
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npz')
+    
+    def get(self, key):
+        """Return the cached (signal, features, labels) for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with np.load(path) as entry:
+                signal = entry['signal']
+                features = entry['features']
+                # Labels are stored as int8 and returned in the dtype of the features
+                labels = entry['labels'].astype(features.dtype)
+        except (OSError, KeyError, ValueError):
+            return None
+        
+        # Mark the entry as recently used
+        os.utime(path)
+        return signal, features, labels
+    
+    def put(self, key, signal, features, labels):
+        """Store an entry and evict old entries if the cache is too large."""
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, signal=signal, features=features, labels=np.asarray(labels, dtype=np.int8))
+        os.replace(tmp_path, path)
+        self.evict()
+    
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_size."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+    
+    def clear(self):
+        """Remove every cache entry."""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                os.remove(os.path.join(self.cache_dir, name))
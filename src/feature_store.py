@@ -0,0 +1,193 @@
+import json
+import os
+import numpy as np
+
+class FeatureStore:
+    """On-disk columnar store of per-frame features, written in append mode.
+    
+    A store is a directory with one raw fixed-width file per column (frame
+    start time, zcr, energy, pitch and label) and a small header.json with
+    the sample rate, hop length, column dtypes, classifier settings and the
+    number of committed frames. Columns are read through read-only memory
+    maps, so any time range can be sliced without loading the recording.
+    
+    Appends write the column files first and then replace the header
+    atomically, so readers in other processes only ever see whole frames
+    and can pick up new ones with refresh(). There is one writer per store.
+    """
+    
+    HEADER = 'header.json'
+    VERSION = 1
+    COLUMNS = ('time', 'zcr', 'energy', 'pitch', 'label')
+    
+    def __init__(self, path, mode='r', sr=None, hop_length=None, frame_length=None, dtype=np.float64, config=None):
+        """Open a store.
+        
+        Args:
+            path: Store directory
+            mode: 'r' to read, 'a' to append (created if missing) or 'w' to
+                create, replacing an existing store
+            sr: Sample rate (needed to create a store)
+            hop_length: Frame stride in samples (needed to create a store)
+            frame_length: Frame length in samples
+            dtype: Floating point type of the feature columns
+            config: Classifier settings (VoiceClassifier.get_config()) kept in the header
+        
+        Raises:
+            ValueError: If the mode is unknown, a store to create lacks sr or
+                hop_length, or an existing store has a different sr or hop_length
+            FileNotFoundError: If a store opened with mode 'r' does not exist
+        """
+        if mode not in ('r', 'a', 'w'):
+            raise ValueError(f"mode must be 'r', 'a' or 'w', got '{mode}'")
+        self.path = path
+        self.mode = mode
+        self._maps = {}
+        
+        header_path = os.path.join(path, self.HEADER)
+        if mode == 'r' or (mode == 'a' and os.path.exists(header_path)):
+            self.refresh()
+            if sr is not None and sr != self.sr or hop_length is not None and hop_length != self.hop_length:
+                raise ValueError(f"Store '{path}' holds frames at sr={self.sr}, hop_length={self.hop_length}")
+            return
+        
+        if sr is None or hop_length is None:
+            raise ValueError("sr and hop_length are needed to create a feature store")
+        feature_dtype = np.dtype(dtype).newbyteorder('<').str
+        self.header = {
+            "version": self.VERSION,
+            "sr": int(sr),
+            "hop_length": int(hop_length),
+            "frame_length": None if frame_length is None else int(frame_length),
+            "n_frames": 0,
+            "columns": {
+                "time": '<f8',
+                "zcr": feature_dtype,
+                "energy": feature_dtype,
+                "pitch": feature_dtype,
+                "label": '|i1'
+            },
+            "config": config or {}
+        }
+        os.makedirs(path, exist_ok=True)
+        for name in self.COLUMNS:
+            open(self._column_path(name), 'wb').close()
+        self._write_header()
+    
+    def __len__(self):
+        """Number of committed frames."""
+        return self.header["n_frames"]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    @property
+    def sr(self):
+        return self.header["sr"]
+    
+    @property
+    def hop_length(self):
+        return self.header["hop_length"]
+    
+    @property
+    def duration(self):
+        """Time in seconds covered by the committed frames."""
+        return len(self) * self.hop_length / self.sr
+    
+    def _column_path(self, name):
+        return os.path.join(self.path, f'{name}.bin')
+    
+    def _write_header(self):
+        """Replace the header atomically."""
+        header_path = os.path.join(self.path, self.HEADER)
+        tmp_path = f'{header_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.header, f, indent=2)
+        os.replace(tmp_path, header_path)
+    
+    def refresh(self):
+        """Re-read the header to see frames appended by another process."""
+        with open(os.path.join(self.path, self.HEADER)) as f:
+            self.header = json.load(f)
+        if self.header.get("version") != self.VERSION:
+            raise ValueError(f"Unsupported feature store version {self.header.get('version')}")
+        self._maps = {}
+    
+    def append(self, features, labels):
+        """Append the features (n_frames, 3) and labels of consecutive frames.
+        
+        Frame times continue from the frames already in the store.
+        """
+        if self.mode == 'r':
+            raise ValueError("Feature store was opened read-only")
+        features = np.asarray(features)
+        n_frames = len(features)
+        if len(labels) != n_frames:
+            raise ValueError(f"Got {len(labels)} labels for {n_frames} frames")
+        if n_frames == 0:
+            return
+        
+        first = len(self)
+        columns = {
+            "time": np.arange(first, first + n_frames) * self.hop_length / self.sr,
+            "zcr": features[:, 0],
+            "energy": features[:, 1],
+            "pitch": features[:, 2],
+            "label": labels
+        }
+        for name, values in columns.items():
+            dtype = np.dtype(self.header["columns"][name])
+            with open(self._column_path(name), 'r+b') as f:
+                # Writing at the committed length drops frames of an interrupted append
+                f.seek(first * dtype.itemsize)
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+                f.truncate()
+        
+        self.header["n_frames"] = first + n_frames
+        self._maps = {}
+        self._write_header()
+    
+    def column(self, name):
+        """Read-only memory map of a column over the committed frames."""
+        if name not in self._maps:
+            dtype = np.dtype(self.header["columns"][name])
+            if len(self) == 0:
+                self._maps[name] = np.zeros(0, dtype=dtype)
+            else:
+                self._maps[name] = np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(len(self),))
+        return self._maps[name]
+    
+    def frame_range(self, start_time, end_time):
+        """Return the (first, last) frame indices starting in [start_time, end_time)."""
+        times = self.column('time')
+        first = int(np.searchsorted(times, start_time, side='left'))
+        last = int(np.searchsorted(times, end_time, side='left'))
+        return first, last
+    
+    def slice(self, start_time=0.0, end_time=None):
+        """Return the columns of the frames starting in [start_time, end_time).
+        
+        Args:
+            start_time: Range start in seconds
+            end_time: Range end in seconds (end of the store if None)
+        
+        Returns:
+            Dictionary of column name to a memory-mapped array slice
+        """
+        if end_time is None:
+            end_time = np.inf
+        first, last = self.frame_range(start_time, end_time)
+        return {name: self.column(name)[first:last] for name in self.COLUMNS}
+    
+    def features(self, start_time=0.0, end_time=None):
+        """Return (features, labels) of a time range in the layout of VoiceClassifier.process."""
+        columns = self.slice(start_time, end_time)
+        features = np.column_stack((columns["zcr"], columns["energy"], columns["pitch"]))
+        return features, columns["label"].astype(np.float64)
+    
+    def close(self):
+        """Release the memory maps."""
+        self._maps = {}
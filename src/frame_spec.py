@@ -0,0 +1,68 @@
+import numpy as np
+
+DEFAULT_SAMPLE_RATE = 16000
+
+
+class FrameSpec:
+    """Sample rate and framing shared by every stage of an analysis.
+    
+    Frame length and stride are given in ms, so the same spec gives the
+    same frame timing at any sample rate; frame_samples and hop_length are
+    the sizes in samples. VoiceClassifier owns a spec and the file handler,
+    streaming classifier, service, feature store and plots take the rate
+    and framing from it.
+    """
+    
+    def __init__(self, sr=DEFAULT_SAMPLE_RATE, frame_length=25, frame_stride=10):
+        """Initialize with the sample rate and the frame length and stride in ms.
+        
+        Raises:
+            ValueError: If a frame would be shorter than 2 samples or the
+                stride shorter than 1 sample
+        """
+        self.sr = int(sr)
+        self.frame_length = frame_length
+        self.frame_stride = frame_stride
+        if self.frame_samples < 2 or self.hop_length < 1:
+            raise ValueError(f"{frame_length} ms frames with a {frame_stride} ms stride are too short at {self.sr} Hz")
+    
+    @classmethod
+    def from_mode(cls, mode, frame_length=None, frame_stride=None):
+        """Create the spec of a named analysis mode (see ANALYSIS_MODES), optionally with other frame sizes in ms."""
+        if mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode '{mode}' (choose from {', '.join(ANALYSIS_MODES)})")
+        spec = ANALYSIS_MODES[mode]
+        return cls(spec.sr, frame_length or spec.frame_length, frame_stride or spec.frame_stride)
+    
+    @property
+    def frame_samples(self):
+        """Frame length in samples."""
+        return int(self.sr * self.frame_length / 1000)
+    
+    @property
+    def hop_length(self):
+        """Frame stride in samples."""
+        return int(self.sr * self.frame_stride / 1000)
+    
+    def frame_times(self, n_frames):
+        """Start time in seconds of each of n_frames frames."""
+        return np.arange(n_frames) * self.hop_length / self.sr
+    
+    def to_dict(self):
+        """Return the spec as a dictionary (part of VoiceClassifier.get_config)."""
+        return {"sr": self.sr, "frame_length": self.frame_length, "frame_stride": self.frame_stride}
+    
+    def __eq__(self, other):
+        return isinstance(other, FrameSpec) and self.to_dict() == other.to_dict()
+    
+    def __repr__(self):
+        return f"FrameSpec(sr={self.sr}, frame_length={self.frame_length}, frame_stride={self.frame_stride})"
+
+
+# Named analysis modes. telephony analyzes at 8 kHz, which holds all of the
+# band of narrowband (telephone) audio: frames have half the samples and the
+# autocorrelation half the lags of wideband analysis.
+ANALYSIS_MODES = {
+    "wideband": FrameSpec(16000),
+    "telephony": FrameSpec(8000)
+}
@@ -0,0 +1,214 @@
+import importlib.util
+import numpy as np
+
+# Backend name -> class, filled by register_backend
+KERNEL_BACKENDS = {}
+
+
+def register_backend(name):
+    """Class decorator that adds a kernel backend to the registry under name."""
+    def decorator(cls):
+        cls.name = name
+        KERNEL_BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def available_backends():
+    """Return the names of the registered backends that can run here."""
+    return [name for name, cls in KERNEL_BACKENDS.items() if cls.is_available()]
+
+
+def get_backend(name):
+    """Create the kernel backend registered under name.
+    
+    Raises:
+        ValueError: If no backend has that name
+        ImportError: If the backend's optional dependency is not installed
+    """
+    if name not in KERNEL_BACKENDS:
+        raise ValueError(f"Unknown kernel backend '{name}' (choose from {', '.join(KERNEL_BACKENDS)})")
+    cls = KERNEL_BACKENDS[name]
+    if not cls.is_available():
+        raise ImportError(f"Kernel backend '{name}' requires {cls.requires} (pip install {cls.requires})")
+    return cls()
+
+
+class KernelBackend:
+    """Computes features and labels for a block of frames.
+    
+    Backends receive the classifier so they use its thresholds, pitch
+    range and metrics. Frames are either an array or a WindowedFrames view,
+    in which case the window has not been applied yet.
+    """
+    
+    requires = None
+    # Whether extract may run on several threads at once (shards of VoiceClassifier(pool='thread'))
+    thread_shards = True
+    
+    @classmethod
+    def is_available(cls):
+        """Whether the backend's dependencies are installed."""
+        return True
+    
+    def extract(self, classifier, frames, sr):
+        """Return features (n_frames, 3) and labels for a block of frames."""
+        raise NotImplementedError
+
+
+@register_backend('numpy')
+class NumpyBackend(KernelBackend):
+    """Reference backend: the vectorized NumPy engine of VoiceClassifier.
+    
+    Each feature is one array pass over the block and the pitch peak comes
+    from the FFT autocorrelation (VoiceClassifier.voicing_peaks).
+    """
+    
+    def extract(self, classifier, frames, sr):
+        with classifier.metrics.stage('features'):
+            frames = np.asarray(frames)
+            classifier.metrics.observe_array('frame_block', frames)
+            
+            zcrs = classifier.zero_crossing_rates(frames)
+            energies = classifier.short_time_energies(frames)
+            
+            if classifier.cascade:
+                # Pitch only for the frames that ZCR and energy still allow to be voiced
+                candidates = classifier.voicing_candidates(zcrs, energies)
+                is_voiced_pitch = np.zeros(len(frames), dtype=bool)
+                pitches = np.zeros(len(frames), dtype=classifier.dtype)
+                if candidates.any():
+                    peak_values, peak_lags = classifier.voicing_peaks(frames[candidates], sr)
+                    is_voiced_pitch[candidates] = peak_values > classifier.voicing_threshold
+                    pitches[candidates] = np.where(is_voiced_pitch[candidates], sr / peak_lags, 0.0)
+                classifier.count_pitch_frames(candidates)
+            else:
+                peak_values, peak_lags = classifier.voicing_peaks(frames, sr)
+                is_voiced_pitch = peak_values > classifier.voicing_threshold
+                pitches = np.where(is_voiced_pitch, sr / peak_lags, 0.0).astype(classifier.dtype, copy=False)
+        
+        with classifier.metrics.stage('classify'):
+            labels = classifier.classify_frames(zcrs, energies, is_voiced_pitch)
+        
+        return np.column_stack((zcrs, energies, pitches)), labels
+
+
+# Compiled on first use so numba is neither imported nor compiling at startup
+_fused_kernel = None
+
+
+def _compile_fused_kernel():
+    """JIT-compile the fused per-frame kernel (cached on disk by numba)."""
+    global _fused_kernel
+    if _fused_kernel is not None:
+        return _fused_kernel
+    
+    from numba import njit, prange
+    
+    @njit(parallel=True, fastmath=True, cache=True)
+    def fused_kernel(raw, window, sr, min_lag, max_lag, voicing_threshold, zcr_threshold,
+                     energy_threshold, silence_threshold, cascade, features, labels):
+        n_frames, frame_length = raw.shape
+        for f in prange(n_frames):
+            x = np.empty(frame_length, dtype=features.dtype)
+            for i in range(frame_length):
+                x[i] = raw[f, i] * window[i]
+            
+            # Zero crossings and energy in one pass
+            crossings = 0.0
+            energy = x[0] * x[0]
+            previous = np.sign(x[0])
+            for i in range(1, frame_length):
+                sign = np.sign(x[i])
+                crossings += abs(sign - previous)
+                previous = sign
+                energy += x[i] * x[i]
+            zcr = crossings / (2 * frame_length)
+            mean_energy = energy / frame_length
+            
+            # Cascade: frames that ZCR and energy already rule out skip the pitch stage
+            if cascade and not (mean_energy >= silence_threshold and zcr < zcr_threshold
+                                and mean_energy > energy_threshold):
+                features[f, 0] = zcr
+                features[f, 1] = mean_energy
+                features[f, 2] = 0.0
+                labels[f] = 0.0 if mean_energy < silence_threshold else 1.0
+                continue
+            
+            # Autocorrelation over the pitch lag range only; the inner loop
+            # runs over contiguous lags so it vectorizes
+            corr = np.zeros(max(max_lag - min_lag, 0), dtype=features.dtype)
+            for i in range(frame_length - min_lag):
+                xi = x[i]
+                for lag in range(min_lag, min(max_lag, frame_length - i)):
+                    corr[lag - min_lag] += xi * x[i + lag]
+            peak_lag = min_lag
+            peak = -np.inf
+            for lag in range(min_lag, max_lag):
+                if corr[lag - min_lag] > peak:
+                    peak = corr[lag - min_lag]
+                    peak_lag = lag
+            peak_value = peak / energy if energy > 0 else 0.0
+            
+            is_voiced_pitch = peak_value > voicing_threshold
+            features[f, 0] = zcr
+            features[f, 1] = mean_energy
+            features[f, 2] = sr / peak_lag if is_voiced_pitch else 0.0
+            
+            if mean_energy < silence_threshold:
+                labels[f] = 0.0
+            elif zcr < zcr_threshold and mean_energy > energy_threshold and is_voiced_pitch:
+                labels[f] = 2.0
+            else:
+                labels[f] = 1.0
+    
+    _fused_kernel = fused_kernel
+    return _fused_kernel
+
+
+@register_backend('numba')
+class NumbaBackend(KernelBackend):
+    """Fused backend compiled with Numba.
+    
+    Windowing, ZCR, energy, the restricted-lag autocorrelation peak and the
+    label are computed in a single pass per frame, with frames spread over
+    all cores. In cascade mode a frame returns before the autocorrelation
+    when ZCR and energy rule out voicing. The autocorrelation is computed directly, so on one or two
+    cores it can be slower than the FFT of the numpy backend; it pays off
+    with more cores. Results match the numpy backend to floating point
+    rounding (see benchmarks/check_backends.py).
+    """
+    
+    requires = 'numba'
+    # The kernel already runs on every core, and the default workqueue threading
+    # layer does not support launching it from several threads at once
+    thread_shards = False
+    
+    @classmethod
+    def is_available(cls):
+        return importlib.util.find_spec('numba') is not None
+    
+    def __init__(self):
+        self.kernel = _compile_fused_kernel()
+    
+    def extract(self, classifier, frames, sr):
+        with classifier.metrics.stage('features'):
+            # Read WindowedFrames rows directly so the windowed block is never materialized
+            raw = getattr(frames, 'raw', None)
+            if raw is not None:
+                window = frames.window
+            else:
+                raw = np.asarray(frames)
+                window = np.ones(raw.shape[1], dtype=raw.dtype)
+            n_frames, frame_length = raw.shape
+            min_lag, max_lag = classifier.pitch_lag_range(sr, frame_length)
+            
+            features = np.empty((n_frames, 3), dtype=classifier.dtype)
+            labels = np.empty(n_frames, dtype=classifier.dtype)
+            if n_frames:
+                self.kernel(raw, window, sr, min_lag, max_lag, classifier.voicing_threshold,
+                            classifier.zcr_threshold, classifier.energy_threshold,
+                            classifier.silence_threshold, classifier.cascade, features, labels)
+            if classifier.cascade:
+                classifier.count_pitch_frames(classifier.voicing_candidates(features[:, 0], features[:, 1]))
+        return features, labels
@@ -0,0 +1,171 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+class Metrics:
+    """Opt-in collector of pipeline timings and sizes.
+    
+    Records wall time per stage (load, frame, features, classify, plot,
+    export), counters such as frames, bytes_read and bytes_written, and the
+    largest array size seen per array name. An optional callback is called
+    as callback(kind, name, value) for every recorded value, with kind one
+    of 'stage', 'counter' or 'array'. Values may be recorded from several
+    threads at once.
+    """
+    
+    def __init__(self, callback=None):
+        """Initialize with an optional callback."""
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+    
+    def reset(self):
+        """Clear all recorded values."""
+        with self._lock:
+            self.stage_seconds = {}
+            self.stage_calls = {}
+            self.counters = {}
+            self.peak_array_bytes = {}
+    
+    @contextmanager
+    def stage(self, name):
+        """Context manager that adds the wall time of its body to a stage."""
+        if getattr(self._local, 'untimed', False):
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + elapsed
+                self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+            if self.callback:
+                self.callback('stage', name, elapsed)
+    
+    @contextmanager
+    def untimed(self):
+        """Context manager under which stage() records nothing in the calling thread.
+        
+        Used by work spread over several threads whose wall time one
+        enclosing stage already records, so concurrent times are not summed.
+        """
+        self._local.untimed = True
+        try:
+            yield
+        finally:
+            self._local.untimed = False
+    
+    def count(self, name, value=1):
+        """Add value to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        if self.callback:
+            self.callback('counter', name, value)
+    
+    def observe_array(self, name, array):
+        """Record the size of an array, keeping the largest size per name."""
+        nbytes = getattr(array, 'nbytes', 0)
+        with self._lock:
+            if nbytes > self.peak_array_bytes.get(name, 0):
+                self.peak_array_bytes[name] = nbytes
+        if self.callback:
+            self.callback('array', name, nbytes)
+    
+    def snapshot(self):
+        """Return all recorded values as a dictionary."""
+        with self._lock:
+            return {
+                "stage_seconds": dict(self.stage_seconds),
+                "stage_calls": dict(self.stage_calls),
+                "counters": dict(self.counters),
+                "peak_array_bytes": dict(self.peak_array_bytes)
+            }
+
+
+class NullMetrics(Metrics):
+    """Metrics collector that records nothing (the default when metrics are off)."""
+    
+    def stage(self, name):
+        return nullcontext()
+    
+    def untimed(self):
+        return nullcontext()
+    
+    def count(self, name, value=1):
+        pass
+    
+    def observe_array(self, name, array):
+        pass
+
+
+class PrometheusExporter:
+    """Writes Metrics to a file in the Prometheus text exposition format.
+    
+    The file is replaced atomically so it can be scraped by the node
+    exporter textfile collector while the pipeline runs.
+    """
+    
+    def __init__(self, path, prefix='voice_classifier'):
+        """Initialize with the output file path and the metric name prefix."""
+        self.path = path
+        self.prefix = prefix
+    
+    def render(self, metrics):
+        """Return the metrics as Prometheus text format."""
+        p = self.prefix
+        lines = [
+            f'# HELP {p}_stage_seconds_total Wall time spent in each pipeline stage.',
+            f'# TYPE {p}_stage_seconds_total counter'
+        ]
+        for name, seconds in sorted(metrics.stage_seconds.items()):
+            lines.append(f'{p}_stage_seconds_total{{stage="{name}"}} {seconds:.9f}')
+        
+        lines += [
+            f'# HELP {p}_stage_calls_total Number of times each pipeline stage ran.',
+            f'# TYPE {p}_stage_calls_total counter'
+        ]
+        for name, calls in sorted(metrics.stage_calls.items()):
+            lines.append(f'{p}_stage_calls_total{{stage="{name}"}} {calls}')
+        
+        for name, value in sorted(metrics.counters.items()):
+            lines += [
+                f'# HELP {p}_{name}_total Total {name.replace("_", " ")}.',
+                f'# TYPE {p}_{name}_total counter',
+                f'{p}_{name}_total {value}'
+            ]
+        
+        lines += [
+            f'# HELP {p}_peak_array_bytes Largest array size seen per array.',
+            f'# TYPE {p}_peak_array_bytes gauge'
+        ]
+        for name, nbytes in sorted(metrics.peak_array_bytes.items()):
+            lines.append(f'{p}_peak_array_bytes{{array="{name}"}} {nbytes}')
+        
+        return '\n'.join(lines) + '\n'
+    
+    def write(self, metrics):
+        """Write the metrics file and return its path."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render(metrics))
+        os.replace(tmp_path, self.path)
+        return self.path
+
+
+def timed(stage_name):
+    """Method decorator that records the call's wall time under stage_name in self.metrics."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.stage(stage_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,131 @@
+import numpy as np
+
+class SegmentIndex:
+    """Run-length index of classified segments.
+    
+    Consecutive frames with the same label are merged into one segment
+    stored as start sample, end sample (exclusive) and label in typed
+    arrays. Point and range queries use binary search over the sorted
+    segment starts.
+    """
+    
+    def __init__(self, starts, ends, labels, sr):
+        """Initialize from segment arrays and the sample rate."""
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.labels = np.asarray(labels, dtype=np.int8)
+        self.sr = sr
+    
+    @classmethod
+    def from_labels(cls, labels, hop_length, n_samples, sr):
+        """Build the index from per-frame labels.
+        
+        Each frame owns the hop_length samples starting at its first sample,
+        and the last frame owns the rest of the signal.
+        
+        Args:
+            labels: Classification labels (2=voiced, 1=unvoiced, 0=silent)
+            hop_length: Frame stride in samples
+            n_samples: Length of the signal in samples
+            sr: Sample rate
+        """
+        labels = np.asarray(labels)
+        if len(labels) == 0:
+            return cls([], [], [], sr)
+        
+        change_points = np.flatnonzero(np.diff(labels)) + 1
+        first_frames = np.concatenate(([0], change_points))
+        starts = first_frames * hop_length
+        ends = np.concatenate((change_points * hop_length, [n_samples]))
+        return cls(starts, ends, labels[first_frames], sr)
+    
+    def __len__(self):
+        return len(self.starts)
+    
+    def __iter__(self):
+        """Iterate over (start_sample, end_sample, label) tuples."""
+        return zip(self.starts.tolist(), self.ends.tolist(), self.labels.tolist())
+    
+    @property
+    def nbytes(self):
+        """Memory used by the segment arrays in bytes."""
+        return self.starts.nbytes + self.ends.nbytes + self.labels.nbytes
+    
+    def duration(self, label):
+        """Total duration in seconds of the segments with the given label."""
+        mask = self.labels == label
+        return np.sum(self.ends[mask] - self.starts[mask]) / self.sr
+    
+    def label_at(self, times):
+        """Return the label at time(s) in seconds, or -1 outside the signal.
+        
+        Args:
+            times: Time in seconds, or an array of times
+        """
+        samples = np.floor(np.asarray(times) * self.sr).astype(np.int64)
+        if len(self) == 0:
+            result = np.full(samples.shape, -1)
+        else:
+            index = np.clip(np.searchsorted(self.starts, samples, side='right') - 1, 0, None)
+            inside = (samples >= self.starts[index]) & (samples < self.ends[index])
+            result = np.where(inside, self.labels[index], -1)
+        return int(result) if result.ndim == 0 else result
+    
+    def frame_labels(self, n_frames, hop_length):
+        """Return the label at the first sample of each frame, or -1 outside the segments.
+        
+        Converts a segment annotation to per-frame reference labels.
+        
+        Args:
+            n_frames: Number of frames
+            hop_length: Frame stride in samples
+        """
+        samples = np.arange(n_frames, dtype=np.int64) * hop_length
+        if len(self) == 0:
+            return np.full(n_frames, -1, dtype=np.int8)
+        index = np.clip(np.searchsorted(self.starts, samples, side='right') - 1, 0, None)
+        inside = (samples >= self.starts[index]) & (samples < self.ends[index])
+        return np.where(inside, self.labels[index], -1).astype(np.int8)
+    
+    def query(self, start_time, end_time, label=None):
+        """Return the segments overlapping [start_time, end_time), clipped to it.
+        
+        Args:
+            start_time: Range start in seconds
+            end_time: Range end in seconds
+            label: Only return segments with this label if given
+            
+        Returns:
+            SegmentIndex with the matching segments
+        """
+        start = int(np.floor(start_time * self.sr))
+        end = int(np.ceil(end_time * self.sr))
+        
+        # Segments with end > start and start < end
+        first = np.searchsorted(self.ends, start, side='right')
+        last = np.searchsorted(self.starts, end, side='left')
+        
+        starts = np.maximum(self.starts[first:last], start)
+        ends = np.minimum(self.ends[first:last], end)
+        labels = self.labels[first:last]
+        
+        if label is not None:
+            mask = labels == label
+            starts, ends, labels = starts[mask], ends[mask], labels[mask]
+        
+        return SegmentIndex(starts, ends, labels, self.sr)
+    
+    def to_seconds(self):
+        """Return the segments as a list of (start_s, end_s, label) tuples."""
+        return [(start / self.sr, end / self.sr, label) for start, end, label in self]
+    
+    def save(self, path):
+        """Save the index to a .npz file and return its path."""
+        np.savez(path, starts=self.starts, ends=self.ends, labels=self.labels, sr=self.sr)
+        return path
+    
+    @classmethod
+    def load(cls, path):
+        """Load an index saved with save()."""
+        with np.load(path) as data:
+            return cls(data['starts'], data['ends'], data['labels'], int(data['sr']))
@@ -0,0 +1,119 @@
+import time
+import numpy as np
+from src.voice_classifier import VoiceClassifier
+
+class StreamingVoiceClassifier:
+    """Incremental voice/unvoiced classification of live audio.
+    
+    Samples are pushed in chunks of any size and every frame that becomes
+    complete is classified right away with the wrapped VoiceClassifier, so
+    thresholds and feature code are shared with the offline path. Only the
+    samples of the next, still incomplete frame are kept between pushes.
+    """
+    
+    def __init__(self, classifier=None, sr=None, frame_length=None, frame_stride=None):
+        """Initialize the stream.
+        
+        Args:
+            classifier: VoiceClassifier instance (a default one is created if None)
+            sr: Sample rate of the pushed samples (defaults to the classifier's frame spec)
+            frame_length: Frame length in ms (defaults to the classifier's frame spec)
+            frame_stride: Frame stride in ms (defaults to the classifier's frame spec)
+        """
+        self.classifier = classifier if classifier is not None else VoiceClassifier()
+        self.sr = self.classifier.frame_spec.sr if sr is None else sr
+        self.frame_length, self.frame_stride = self.classifier.frame_sizes(self.sr, frame_length, frame_stride)
+        self.reset()
+    
+    def reset(self):
+        """Drop any buffered samples and start a new stream."""
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.skip = 0  # Samples to drop before the next frame starts (stride > length)
+        self.samples_seen = 0
+        self.frames_emitted = 0
+        self.last_features = np.zeros((0, 3))
+        self.last_latency = 0.0
+    
+    def push(self, samples):
+        """Add a chunk of samples and classify the frames it completes.
+        
+        Args:
+            samples: 1-D array of samples of any length
+            
+        Returns:
+            labels: Classification labels for the newly completed frames
+            (features are available in last_features)
+        """
+        start_time = time.perf_counter()
+        features, labels = self._classify(self.next_frames(samples))
+        self.last_latency = time.perf_counter() - start_time
+        return labels
+    
+    def flush(self):
+        """Classify the zero-padded frames that run past the end of the stream.
+        
+        Returns:
+            labels: Classification labels for the tail frames
+        """
+        start_time = time.perf_counter()
+        features, labels = self._classify(self.tail_frames())
+        self.last_latency = time.perf_counter() - start_time
+        return labels
+    
+    def next_frames(self, samples):
+        """Add a chunk of samples and return the frames it completes, unclassified.
+        
+        Used by callers that classify frames themselves (e.g. batched across
+        several streams); push() is next_frames() followed by classification.
+        
+        Returns:
+            frames: Windowed frames of shape (n_frames, frame_length) (WindowedFrames view)
+        """
+        samples = np.asarray(samples)
+        self.samples_seen += len(samples)
+        if self.skip:
+            dropped = min(self.skip, len(samples))
+            samples = samples[dropped:]
+            self.skip -= dropped
+        buffer = np.concatenate((self.buffer.astype(samples.dtype, copy=False), samples))
+        
+        count = 0
+        if len(buffer) >= self.frame_length:
+            count = (len(buffer) - self.frame_length) // self.frame_stride + 1
+        frames = self._frames(buffer, count)
+        
+        # Keep only what the next frame still needs
+        consumed = count * self.frame_stride
+        self.skip += max(consumed - len(buffer), 0)
+        self.buffer = buffer[consumed:].copy()
+        return frames
+    
+    def tail_frames(self):
+        """Return the zero-padded frames that run past the end of the stream, unclassified."""
+        total = self.classifier.frame_count(self.samples_seen, self.frame_length, self.frame_stride)
+        frames = self._frames(self.buffer, max(total - self.frames_emitted, 0))
+        self.buffer = self.buffer[:0]
+        return frames
+    
+    def _frames(self, buffer, count):
+        """Return a view of count windowed frames starting at buffer[0].
+        
+        The view stays valid after the stream moves on, since the buffer is
+        replaced rather than modified.
+        """
+        self.frames_emitted += count
+        if count == 0:
+            return np.zeros((0, self.frame_length))
+        return self.classifier.frame_view(buffer, count, self.frame_length, self.frame_stride)
+    
+    def _classify(self, frames):
+        """Classify a block of frames."""
+        if len(frames) == 0:
+            self.last_features = np.zeros((0, 3))
+            return self.last_features, np.zeros(0)
+        
+        # _frames() has already counted this block
+        features, labels = self.classifier.extract_features(frames, self.sr, progress=False,
+                                                            frame_offset=self.frames_emitted - len(frames))
+        self.last_features = features
+        return features, labels
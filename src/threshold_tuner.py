@@ -0,0 +1,239 @@
+import numpy as np
+from src.voice_classifier import VoiceClassifier
+from src.segment_index import SegmentIndex
+
+LABEL_NAMES = ('silent', 'unvoiced', 'voiced')
+THRESHOLD_NAMES = ('zcr_threshold', 'energy_threshold', 'silence_threshold', 'voicing_threshold')
+
+
+class SweepResult:
+    """Scores of every threshold combination of a sweep.
+    
+    Arrays are indexed [zcr, energy, silence, voicing] by the positions of
+    the values in grid (sorted, without duplicates). confusion has two more
+    axes, [reference label, predicted label].
+    """
+    
+    def __init__(self, grid, confusion):
+        """Initialize from the threshold grid and the confusion matrices."""
+        self.grid = grid
+        self.confusion = confusion
+        
+        true_positives = np.diagonal(confusion, axis1=-2, axis2=-1)
+        support = confusion.sum(axis=-1)
+        predicted = confusion.sum(axis=-2)
+        denominator = support + predicted
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # F1 = 2 TP / (2 TP + FP + FN), 0 for classes that never occur (as in scikit-learn)
+            self.f1 = np.where(denominator > 0, 2 * true_positives / denominator, 0.0)
+            total = support.sum(axis=-1)
+            self.accuracy = np.where(total > 0, true_positives.sum(axis=-1) / total, 0.0)
+        self.macro_f1 = self.f1.mean(axis=-1)
+    
+    @property
+    def shape(self):
+        """Shape of the grid (zcr, energy, silence, voicing)."""
+        return self.macro_f1.shape
+    
+    def summary(self, index):
+        """Return thresholds and scores of the combination at a grid index."""
+        return {
+            "thresholds": {name: float(self.grid[name][i]) for name, i in zip(THRESHOLD_NAMES, index)},
+            "macro_f1": float(self.macro_f1[index]),
+            "accuracy": float(self.accuracy[index]),
+            "f1": {name: float(score) for name, score in zip(LABEL_NAMES, self.f1[index])},
+            "confusion": self.confusion[index].tolist()
+        }
+    
+    def best(self, metric='macro_f1'):
+        """Return the summary of the best combination by metric ('macro_f1' or 'accuracy')."""
+        scores = getattr(self, metric)
+        return self.summary(np.unravel_index(np.argmax(scores), scores.shape))
+    
+    def top(self, n=10, metric='macro_f1'):
+        """Return the summaries of the n best combinations by metric."""
+        scores = getattr(self, metric).ravel()
+        order = np.argsort(-scores, kind='stable')[:n]
+        return [self.summary(np.unravel_index(i, self.shape)) for i in order]
+
+
+class ThresholdTuner:
+    """Tunes the classifier thresholds against reference labels.
+    
+    Features are extracted once per signal: ZCR, energy and the normalized
+    autocorrelation peak, which do not depend on any threshold. sweep()
+    then scores a whole grid of zcr, energy, silence and voicing thresholds
+    in one vectorized pass. Frames are binned along each threshold axis and
+    cumulative histograms give the confusion matrix of every combination at
+    once, so the cost is O(frames + grid size) rather than one classification
+    run per combination.
+    """
+    
+    def __init__(self, classifier=None):
+        """Initialize with the classifier whose features and thresholds are used."""
+        self.classifier = classifier if classifier is not None else VoiceClassifier(progress=False)
+        self.zcrs = []
+        self.energies = []
+        self.peaks = []
+        self.reference = []
+    
+    def __len__(self):
+        """Number of frames added so far."""
+        return sum(len(zcrs) for zcrs in self.zcrs)
+    
+    def add(self, signal, sr, reference, frame_length=None, frame_stride=None, batch_size=256):
+        """Extract the features of a signal and store them with its reference labels.
+        
+        Args:
+            signal: Audio signal
+            sr: Sample rate
+            reference: Per-frame labels (2=voiced, 1=unvoiced, 0=silent, -1 to
+                ignore a frame) or a SegmentIndex annotation of the signal
+            frame_length: Frame length in ms (defaults to the classifier's frame spec)
+            frame_stride: Frame stride in ms (defaults to the classifier's frame spec)
+            batch_size: Frames per vectorized block
+        """
+        frames = self.classifier.extract_frames(signal, sr, frame_length, frame_stride, lazy=True)
+        n_frames = len(frames)
+        if isinstance(reference, SegmentIndex):
+            reference = reference.frame_labels(n_frames, frames.hop_length)
+        reference = np.asarray(reference)
+        if len(reference) != n_frames:
+            raise ValueError(f"Got {len(reference)} reference labels for {n_frames} frames")
+        
+        zcrs = np.zeros(n_frames)
+        energies = np.zeros(n_frames)
+        peaks = np.zeros(n_frames)
+        for start in range(0, n_frames, batch_size):
+            end = min(start + batch_size, n_frames)
+            block = np.asarray(frames.rows(start, end))
+            zcrs[start:end] = self.classifier.zero_crossing_rates(block)
+            energies[start:end] = self.classifier.short_time_energies(block)
+            peaks[start:end] = self.classifier.voicing_peaks(block, sr)[0]
+        
+        self.zcrs.append(zcrs)
+        self.energies.append(energies)
+        self.peaks.append(peaks)
+        self.reference.append(reference.astype(np.int8))
+    
+    def save(self, path):
+        """Save the extracted features and reference labels to a .npz file and return its path."""
+        zcrs, energies, peaks, reference = self._arrays()
+        np.savez(path, zcrs=zcrs, energies=energies, peaks=peaks, reference=reference)
+        return path
+    
+    def load(self, path):
+        """Add the features and reference labels saved with save()."""
+        with np.load(path) as data:
+            self.zcrs.append(data['zcrs'])
+            self.energies.append(data['energies'])
+            self.peaks.append(data['peaks'])
+            self.reference.append(data['reference'])
+    
+    def _arrays(self):
+        """Concatenate the features of all added signals."""
+        if not self.zcrs:
+            return np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int8)
+        return (np.concatenate(self.zcrs), np.concatenate(self.energies),
+                np.concatenate(self.peaks), np.concatenate(self.reference))
+    
+    def default_grid(self):
+        """Return sweep() arguments spanning typical values of each threshold (265,625 combinations)."""
+        return {
+            "zcr_thresholds": np.linspace(0.02, 0.5, 25),
+            "energy_thresholds": np.logspace(-6, -2, 25),
+            "silence_thresholds": np.logspace(-7, -3, 25),
+            "voicing_thresholds": np.linspace(0.1, 0.9, 17)
+        }
+    
+    def sweep(self, zcr_thresholds=None, energy_thresholds=None, silence_thresholds=None, voicing_thresholds=None):
+        """Score every combination of the given threshold values.
+        
+        Thresholds left as None keep the classifier's current value.
+        Frames whose reference label is not 0, 1 or 2 are ignored.
+        
+        Returns:
+            SweepResult with the confusion matrix, F1 per class, macro F1 and
+            accuracy of every combination
+        """
+        c = self.classifier
+        values = (zcr_thresholds, energy_thresholds, silence_thresholds, voicing_thresholds)
+        defaults = (c.zcr_threshold, c.energy_threshold, c.silence_threshold, c.voicing_threshold)
+        grid = {name: np.unique(np.atleast_1d(np.asarray(default if value is None else value, dtype=np.float64)))
+                for name, value, default in zip(THRESHOLD_NAMES, values, defaults)}
+        z, e, s, v = (grid[name] for name in THRESHOLD_NAMES)
+        
+        zcrs, energies, peaks, reference = self._arrays()
+        valid = (reference >= 0) & (reference <= 2)
+        zcrs, energies, peaks = zcrs[valid], energies[valid], peaks[valid]
+        reference = reference[valid].astype(np.int64)
+        
+        # Bin each frame along every axis so each threshold test becomes a bin comparison:
+        #   zcr < z[k]       <=>  z_bin <= k
+        #   energy > e[k]    <=>  e_bin > k
+        #   energy >= s[k]   <=>  s_bin > k   (not silent)
+        #   peak > v[k]      <=>  v_bin > k
+        z_bin = np.searchsorted(z, zcrs, side='right')
+        e_bin = np.searchsorted(e, energies, side='left')
+        s_bin = np.searchsorted(s, energies, side='right')
+        v_bin = np.searchsorted(v, peaks, side='left')
+        
+        # Histogram of frames per reference label and bin cell
+        shape = (3, len(z) + 1, len(e) + 1, len(s) + 1, len(v) + 1)
+        cell = np.ravel_multi_index((reference, z_bin, e_bin, s_bin, v_bin), shape)
+        counts = np.bincount(cell, minlength=int(np.prod(shape))).reshape(shape)
+        
+        # Cumulative counts turn the histogram into "voiced" counts for every threshold combination
+        counts = counts.cumsum(axis=1)
+        for axis in (2, 3, 4):
+            counts = np.flip(np.flip(counts, axis).cumsum(axis=axis), axis)
+        voiced = counts[:, :len(z), 1:, 1:, 1:]
+        
+        # Silent frames (energy < s) only depend on the silence threshold
+        silent = np.bincount(reference * (len(s) + 1) + s_bin, minlength=3 * (len(s) + 1)).reshape(3, len(s) + 1)
+        silent = silent.cumsum(axis=1)[:, :len(s)]
+        support = np.bincount(reference, minlength=3)
+        
+        confusion = np.empty((len(z), len(e), len(s), len(v), 3, 3), dtype=np.int64)
+        for label in range(3):
+            confusion[..., label, 0] = silent[label][None, None, :, None]
+            confusion[..., label, 2] = voiced[label]
+            confusion[..., label, 1] = support[label] - confusion[..., label, 0] - confusion[..., label, 2]
+        
+        return SweepResult(grid, confusion)
+    
+    def evaluate(self, zcr_threshold=None, energy_threshold=None, silence_threshold=None, voicing_threshold=None):
+        """Classify with one set of thresholds and score it with scikit-learn.
+        
+        Thresholds left as None keep the classifier's current value. This is
+        the frame-by-frame reference for sweep().
+        
+        Returns:
+            Dictionary with macro_f1, accuracy, f1 per class and the confusion matrix
+        """
+        from sklearn.metrics import accuracy_score, confusion_matrix, f1_score
+        
+        c = self.classifier
+        zcrs, energies, peaks, reference = self._arrays()
+        valid = (reference >= 0) & (reference <= 2)
+        zcrs, energies, peaks, reference = zcrs[valid], energies[valid], peaks[valid], reference[valid]
+        
+        thresholds = {
+            "zcr_threshold": c.zcr_threshold if zcr_threshold is None else zcr_threshold,
+            "energy_threshold": c.energy_threshold if energy_threshold is None else energy_threshold,
+            "silence_threshold": c.silence_threshold if silence_threshold is None else silence_threshold,
+            "voicing_threshold": c.voicing_threshold if voicing_threshold is None else voicing_threshold
+        }
+        voiced = ((zcrs < thresholds["zcr_threshold"]) & (energies > thresholds["energy_threshold"])
+                  & (peaks > thresholds["voicing_threshold"]))
+        predicted = np.where(voiced, 2, 1)
+        predicted[energies < thresholds["silence_threshold"]] = 0
+        
+        f1 = f1_score(reference, predicted, labels=[0, 1, 2], average=None, zero_division=0)
+        return {
+            "thresholds": thresholds,
+            "macro_f1": float(np.mean(f1)),
+            "accuracy": float(accuracy_score(reference, predicted)) if len(reference) else 0.0,
+            "f1": {name: float(score) for name, score in zip(LABEL_NAMES, f1)},
+            "confusion": confusion_matrix(reference, predicted, labels=[0, 1, 2]).tolist()
+        }
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from src.voice_classifier import VoiceClassifier
+from benchmarks.check_backends import FEATURE_RTOL, MAX_LABEL_MISMATCH, compare, edge_case_signals
+from benchmarks.run_benchmarks import generate_signal
+
+pytest.importorskip('numba')
+
+SIGNALS = dict(edge_case_signals(), generated_3s=generate_signal(3))
+
+
+def _extract(classifier, signal):
+    return classifier.extract_features(classifier.extract_frames(signal, 16000, lazy=True), 16000)
+
+
+@pytest.mark.parametrize('cascade', [False, True])
+@pytest.mark.parametrize('dtype', ['float64', 'float32'])
+@pytest.mark.parametrize('name', sorted(SIGNALS))
+def test_numba_matches_numpy(name, dtype, cascade):
+    signal = SIGNALS[name]
+    reference = _extract(VoiceClassifier(progress=False, cascade=cascade), signal)
+    result = _extract(VoiceClassifier(progress=False, backend='numba', dtype=dtype, cascade=cascade), signal)
+    
+    assert compare(f"numba/{dtype}/{name}", reference, result, FEATURE_RTOL[dtype], MAX_LABEL_MISMATCH[dtype]) == []
+
+
+@pytest.mark.parametrize('dtype', ['float64', 'float32'])
+@pytest.mark.parametrize('name', sorted(SIGNALS))
+def test_numba_cascade_keeps_labels(name, dtype):
+    _, labels = _extract(VoiceClassifier(progress=False, backend='numba', dtype=dtype), SIGNALS[name])
+    _, cascade_labels = _extract(VoiceClassifier(progress=False, backend='numba', dtype=dtype, cascade=True), SIGNALS[name])
+    
+    np.testing.assert_array_equal(cascade_labels, labels)
@@ -0,0 +1,47 @@
+import pickle
+
+import numpy as np
+
+from src.voice_classifier import VoiceClassifier, WindowedFrames
+
+
+def _signal(seconds=0.5, sr=16000):
+    rng = np.random.default_rng(0)
+    return (0.1 * rng.standard_normal(int(seconds * sr))).astype(np.float32)
+
+
+def test_process_returns_eager_frames():
+    classifier = VoiceClassifier(progress=False)
+    signal = _signal()
+    eager = classifier.extract_frames(signal, 16000)
+    
+    frames, features, labels = classifier.process(signal, 16000)
+    
+    assert isinstance(frames, np.ndarray)
+    np.testing.assert_array_equal(frames, eager)
+    np.testing.assert_array_equal(frames[2, 5], eager[2, 5])
+    np.testing.assert_array_equal(frames[:, :10], eager[:, :10])
+    assert frames.mean() == eager.mean()
+
+
+def test_lazy_frames_index_like_eager_frames():
+    classifier = VoiceClassifier(progress=False)
+    signal = _signal()
+    eager = classifier.extract_frames(signal, 16000)
+    lazy = classifier.extract_frames(signal, 16000, lazy=True)
+    
+    assert lazy.shape == eager.shape
+    assert lazy.ndim == eager.ndim
+    assert lazy.dtype == eager.dtype
+    for index in (3, slice(2, 7), (2, 5), (slice(None), slice(None, 10)), (slice(1, 4), 7), ([0, 4], [1, 2])):
+        np.testing.assert_array_equal(lazy[index], eager[index])
+
+
+def test_pickle_round_trips_strided_and_gathered_frames():
+    classifier = VoiceClassifier(progress=False)
+    lazy = classifier.extract_frames(_signal(), 16000, lazy=True)
+    # Rows gathered from anywhere in the signal, as process_many builds its blocks
+    gathered = WindowedFrames(lazy.raw[[0, 3, 17, 18, 40]], lazy.window, lazy.hop_length)
+    
+    for frames in (lazy, lazy.rows(5, 30), gathered):
+        np.testing.assert_array_equal(np.asarray(pickle.loads(pickle.dumps(frames))), np.asarray(frames))